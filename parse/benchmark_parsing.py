@@ -0,0 +1,74 @@
+"""Times the issuer page parsers on saved pages and checks that they agree.
+
+Pages default to everything the crawler stored under pages/ plus main.html.
+--scale repeats the body of every page to emulate issuers with long filing
+histories.
+
+    python benchmark_parsing.py pages/issuer/*/index.html --scale 20
+"""
+
+import argparse
+import re
+import statistics
+import time
+from pathlib import Path
+
+import tables
+
+
+def scaled(html: bytes, scale: int) -> bytes:
+    """Repeats the body content `scale` times"""
+    match = re.search(rb"(<body[^>]*>)(.*)(</body>)", html, flags=re.S | re.I)
+    if match is None or scale <= 1:
+        return html
+    body = match.group(2) * scale
+    return html[: match.start(2)] + body + html[match.end(2) :]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pages", nargs="*", type=Path)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = args.pages or sorted(Path("pages").glob("**/index.html"))
+    if not args.pages and Path("main.html").exists():
+        pages.append(Path("main.html"))
+    documents = [scaled(page.read_bytes(), args.scale) for page in pages]
+    print(
+        f"{len(documents)} pages, {sum(map(len, documents)) / 2**20:.1f} MB, "
+        f"lxml {'available' if tables.lxml_html is not None else 'missing'}"
+    )
+
+    parsers = {
+        "siblings": tables.parse_tables_siblings,
+        "forward soup": tables.parse_tables_soup,
+    }
+    if tables.lxml_html is not None:
+        parsers["forward lxml"] = tables.parse_tables_lxml
+
+    reference = None
+    for name, parse in parsers.items():
+        times, outputs = [], []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            outputs = [parse(html, "https://www.disclosure.ru/") for html in documents]
+            times.append(time.perf_counter() - start)
+
+        line = f"{name:<13}: {1000 * statistics.median(times) / len(documents):9.1f} ms/page"
+        if reference is None:
+            reference = outputs
+        else:
+            same = sum(
+                list(a_tables) == list(b_tables)
+                and all(a_tables[key].equals(b_tables[key]) for key in a_tables)
+                and a_tasks == b_tasks
+                for (a_tables, a_tasks), (b_tables, b_tasks) in zip(reference, outputs)
+            )
+            line += f", same output as siblings on {same}/{len(documents)} pages"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
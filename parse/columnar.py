@@ -0,0 +1,141 @@
+import hashlib
+import shutil
+import uuid
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from urllib.parse import quote
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # optional, only needed for the columnar output
+    pa = None
+
+
+@dataclass
+class ColumnarConfig:
+    # dataset root, laid out as issuer=<id>/section=<label>/part-0.<format>
+    path: Path = Path("tables")
+    # "parquet" or "arrow" (Arrow IPC / Feather v2)
+    format: str = "parquet"
+    compression: str = "zstd"
+    # directory names are limited to 255 bytes and percent-encoding turns a
+    # Cyrillic character into 6 of them, longer labels are cut and hashed
+    max_name_bytes: int = 200
+
+
+class ColumnarWriter:
+    """Writes crawled tables as a hive-partitioned Parquet or Arrow dataset.
+
+    Every issuer is written as soon as its crawl completes and replaces the
+    previous partition of that issuer, so re-crawls do not duplicate rows.
+    Partition directories of long labels are shortened, the full label of a
+    section is kept in its `section_label` column.
+    Downstream readers can select columns and filter on issuer and section:
+
+        pyarrow.dataset.dataset("tables", format="parquet", partitioning="hive")
+    """
+
+    def __init__(self, cfg: ColumnarConfig = ColumnarConfig()):
+        if pa is None:
+            raise ImportError("Columnar output needs pyarrow: pip install pyarrow")
+        if cfg.format not in ("parquet", "arrow"):
+            raise ValueError(f"Unknown columnar format: {cfg.format}")
+        self.cfg = cfg
+
+    def partition(self, key: str, value: str) -> str:
+        # hive partitioning percent-decodes directory names by default
+        encoded = quote(value, safe="")
+        if len(key) + 1 + len(encoded) <= self.cfg.max_name_bytes:
+            return f"{key}={encoded}"
+
+        # a prefix of whole characters plus a hash of the full value
+        digest = hashlib.sha256(value.encode()).hexdigest()[:10]
+        budget = self.cfg.max_name_bytes - len(key) - len(digest) - 2
+        prefix = ""
+        for char in value:
+            part = quote(char, safe="")
+            if len(prefix) + len(part) > budget:
+                break
+            prefix += part
+        return f"{key}={prefix}~{digest}"
+
+    @staticmethod
+    def column_names(columns: list) -> list[str]:
+        """Unique, non-empty column names, as Parquet requires"""
+        names, used = [], set()
+        for idx, column in enumerate(columns):
+            name = str(column) or f"column_{idx + 1}"
+            base, number = name, 1
+            while name in used:
+                number += 1
+                name = f"{base}_{number}"
+            used.add(name)
+            names.append(name)
+        return names
+
+    @staticmethod
+    def to_arrow(df: pd.DataFrame) -> "pa.Table":
+        """Date columns become date32 with the original text of every cell in
+        a <column>_raw companion, everything else is kept as text"""
+        df = df.copy()
+        columns = list(df.columns)
+        names = ColumnarWriter.column_names(columns)
+        df.columns = names
+
+        def text(value):
+            if isinstance(value, date):
+                return value.strftime("%d.%m.%Y")
+            return None if pd.isna(value) else str(value)
+
+        arrays, fields = [], []
+        for original, name in zip(columns, names):
+            if "Дата" in str(original):
+                # cells that did not parse as dd.mm.yyyy are null here and
+                # keep their text in the raw column
+                dates = [value if isinstance(value, date) else None for value in df[name]]
+                arrays.append(pa.array(dates, pa.date32()))
+                fields.append(pa.field(name, pa.date32()))
+                raw_name = ColumnarWriter.column_names([*names, f"{name}_raw"])[-1]
+                names.append(raw_name)
+                arrays.append(pa.array([text(value) for value in df[name]], pa.string()))
+                fields.append(pa.field(raw_name, pa.string()))
+            else:
+                arrays.append(pa.array([text(value) for value in df[name]], pa.string()))
+                fields.append(pa.field(name, pa.string()))
+        return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+    def write_table(self, table: "pa.Table", path: Path):
+        if self.cfg.format == "parquet":
+            pq.write_table(table, path, compression=self.cfg.compression)
+        else:
+            feather.write_feather(table, path, compression=self.cfg.compression)
+
+    def write_issuer(self, issuer_id: str, tables: dict[str, pd.DataFrame]) -> Path:
+        """Writes all sections of an issuer and swaps them in at once"""
+        root = self.cfg.path
+        target = root / self.partition("issuer", issuer_id)
+        staging = root / f".{target.name}.{uuid.uuid4().hex}.tmp"
+        for section, df in tables.items():
+            directory = staging / self.partition("section", section)
+            directory.mkdir(parents=True, exist_ok=True)
+            table = self.to_arrow(df)
+            label = self.column_names([*table.column_names, "section_label"])[-1]
+            table = table.append_column(
+                label, pa.array([section] * table.num_rows, pa.string())
+            )
+            self.write_table(table, directory / f"part-0.{self.cfg.format}")
+        staging.mkdir(parents=True, exist_ok=True)
+
+        previous = None
+        if target.exists():
+            previous = root / f".{target.name}.{uuid.uuid4().hex}.old"
+            target.replace(previous)
+        staging.replace(target)
+        if previous is not None:
+            shutil.rmtree(previous)
+        return target
@@ -0,0 +1,150 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Iterable
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+import pandas as pd
+
+from downloader import Downloader
+from tables import parse_tables
+
+issuers_url = "https://www.disclosure.ru/issuer/"
+
+
+@dataclass
+class CrawlerConfig:
+    # issuer pages are at <base_url><issuer id>/
+    base_url: str = issuers_url
+    # issuers crawled at the same time; downloads are bounded by the downloader
+    workers: int = 4
+    # issuer pages are stored under their URL path, e.g. pages/issuer/<id>/,
+    # so the directory can be served as a recorded fixture site
+    pages_dir: Path = Path("pages")
+    documents_dir: Path = Path("documents")
+    # point absolute document links at the host of base_url, for fixture
+    # servers that replay a recorded site
+    rebase_links: bool = False
+    # "forward" or "siblings", see tables.parse_tables
+    parser: str = "forward"
+
+
+@dataclass
+class IssuerResult:
+    issuer_id: str
+    url: str
+    tables: dict[str, pd.DataFrame] = field(default_factory=dict)
+    documents: list[Path | None] = field(default_factory=list)
+    seconds: float = 0.0
+    error: str | None = None
+
+
+@dataclass
+class CrawlMetrics:
+    issuers: int = 0
+    done: int = 0
+    failed: int = 0
+    documents: int = 0
+    failed_documents: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    def add(self, result: IssuerResult):
+        self.done += 1
+        self.failed += result.error is not None
+        self.documents += sum(path is not None for path in result.documents)
+        self.failed_documents += sum(path is None for path in result.documents)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def issuers_per_minute(self) -> float:
+        return 60 * self.done / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def documents_per_second(self) -> float:
+        return self.documents / self.elapsed if self.elapsed else 0.0
+
+    def progress(self) -> str:
+        return (
+            f"[{self.done}/{self.issuers}] {self.failed} failed, "
+            f"{self.documents} documents ({self.failed_documents} failed), "
+            f"{self.issuers_per_minute:.1f} issuers/min, "
+            f"{self.documents_per_second:.2f} documents/s"
+        )
+
+
+class Crawler:
+    """Crawls issuer pages through a shared work queue: `workers` issuers are
+    fetched, parsed and downloaded at once, and every issuer's result is
+    emitted as soon as it is complete."""
+
+    def __init__(self, downloader: Downloader, cfg: CrawlerConfig = CrawlerConfig()):
+        self.downloader = downloader
+        self.cfg = cfg
+        self.metrics = CrawlMetrics()
+
+    def issuer_url(self, issuer_id: str) -> str:
+        return urljoin(self.cfg.base_url, f"{issuer_id}/")
+
+    def page_path(self, url: str) -> Path:
+        return self.cfg.pages_dir / urlsplit(url).path.strip("/") / "index.html"
+
+    def rebase(self, url: str) -> str:
+        if not self.cfg.rebase_links:
+            return url
+        base = urlsplit(self.cfg.base_url)
+        return urlunsplit(urlsplit(url)._replace(scheme=base.scheme, netloc=base.netloc))
+
+    async def crawl_issuer(self, issuer_id: str) -> IssuerResult:
+        url = self.issuer_url(issuer_id)
+        result = IssuerResult(issuer_id=issuer_id, url=url)
+        start = time.perf_counter()
+        try:
+            html = await self.downloader.fetch_page(url, self.page_path(url))
+            # parsing is CPU bound, keep the event loop free for transfers
+            result.tables, download_tasks = await asyncio.to_thread(
+                parse_tables,
+                html,
+                url,
+                self.cfg.documents_dir / issuer_id,
+                self.cfg.parser,
+            )
+            result.documents = await self.downloader.download_all(
+                [(self.rebase(link), save_path) for link, save_path in download_tasks]
+            )
+        except Exception as e:
+            result.error = repr(e)
+        result.seconds = time.perf_counter() - start
+        return result
+
+    async def crawl(self, issuer_ids: Iterable[str]) -> AsyncIterator[IssuerResult]:
+        """Yields the result of every issuer in order of completion"""
+        issuer_ids = list(dict.fromkeys(str(issuer_id) for issuer_id in issuer_ids))
+        self.metrics = CrawlMetrics(issuers=len(issuer_ids))
+
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        for issuer_id in issuer_ids:
+            queue.put_nowait(issuer_id)
+        results: asyncio.Queue[IssuerResult] = asyncio.Queue()
+
+        async def worker():
+            while not queue.empty():
+                issuer_id = queue.get_nowait()
+                await results.put(await self.crawl_issuer(issuer_id))
+
+        workers = [
+            asyncio.create_task(worker())
+            for _ in range(min(self.cfg.workers, len(issuer_ids)))
+        ]
+        try:
+            for _ in issuer_ids:
+                result = await results.get()
+                self.metrics.add(result)
+                yield result
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,400 @@
+import asyncio
+import hashlib
+import random
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+import magic  # python-magic for file type detection
+
+from manifest import Manifest, ManifestEntry
+
+# statuses worth another attempt: server errors and rate limiting
+RETRY_STATUSES = {429} | set(range(500, 600))
+
+# suffix of files still being downloaded
+PARTIAL_SUFFIX = ".part"
+# next to a partial file, the validator of the response it was started from
+VALIDATOR_SUFFIX = ".validator"
+
+# one libmagic handle for all downloads, creating it loads the magic database
+mime_detector = magic.Magic(mime=True)
+
+
+class IncompleteDownload(Exception):
+    """The server kept answering with ranges that do not continue the partial file"""
+
+
+def sniff_extension(header: bytes) -> str:
+    """Extension from the MIME type of the first bytes of a file"""
+    content_type = mime_detector.from_buffer(header)
+    return content_type.split("/")[-1]  # Get the extension based on MIME type
+
+
+@dataclass
+class DownloadConfig:
+    # files downloaded at the same time
+    concurrency: int = 8
+    # connection pool of the shared client
+    max_connections: int = 16
+    max_keepalive_connections: int = 8
+    # seconds, per request
+    timeout: float = 30.0
+    connect_timeout: float = 10.0
+    # attempts after the first one on 5xx, 429 and network errors
+    retries: int = 4
+    # delay before the first retry, doubled on every next one
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+    # requests per second to a single host, 0 for no limit
+    requests_per_second: float = 5.0
+    # requests in flight to a single host, pages and files together
+    max_per_host: int = 4
+    # bytes read from the response and written to disk at a time
+    chunk_size: int = 64 * 1024
+    # bytes at the start of a file the type is detected from
+    sniff_bytes: int = 2048
+    # what was downloaded, from where, and its validators
+    manifest_path: Path = Path("manifest.sqlite3")
+    # request known documents again with If-None-Match / If-Modified-Since;
+    # when off, documents in the manifest are skipped without a request
+    revalidate: bool = True
+
+
+class HostRateLimiter:
+    """Spaces requests to the same host at least 1 / rate seconds apart"""
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1 / requests_per_second if requests_per_second > 0 else 0.0
+        self.next_slot: dict[str, float] = {}
+        self.locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def wait(self, host: str):
+        if not self.interval:
+            return
+        async with self.locks[host]:
+            now = asyncio.get_running_loop().time()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class Downloader:
+    """Shared HTTP client with bounded parallelism, timeouts, retries and
+    per-host rate limiting.
+
+    Pass `client` to talk to a local stand-in server, e.g. an AsyncClient
+    with a MockTransport or a base_url of a test server."""
+
+    def __init__(
+        self,
+        cfg: DownloadConfig = DownloadConfig(),
+        client: httpx.AsyncClient | None = None,
+        manifest: Manifest | None = None,
+    ):
+        self.cfg = cfg
+        self.manifest = manifest or Manifest(cfg.manifest_path)
+        self.client = client or httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=cfg.max_connections,
+                max_keepalive_connections=cfg.max_keepalive_connections,
+            ),
+            timeout=httpx.Timeout(cfg.timeout, connect=cfg.connect_timeout),
+            follow_redirects=True,
+        )
+        self.semaphore = asyncio.Semaphore(cfg.concurrency)
+        self.host_slots: defaultdict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(cfg.max_per_host)
+        )
+        self.rate_limiter = HostRateLimiter(cfg.requests_per_second)
+        # one download at a time per partial file
+        self.path_locks: defaultdict[Path, asyncio.Lock] = defaultdict(asyncio.Lock)
+        # legacy file names (save path without suffix) requested for more
+        # than one URL; such files cannot be told apart and are never adopted
+        self.shared_names: set[Path] = set()
+        # legacy files of every directory seen by adopt, listed once per crawl
+        self.legacy_files: dict[Path, dict[Path, Path]] = {}
+        self.legacy_locks: defaultdict[Path, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+        self.manifest.close()
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential delay with jitter so that retries do not arrive together"""
+        delay = min(self.cfg.backoff * 2**attempt, self.cfg.max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Sends the request, retrying network errors, timeouts and retryable
+        statuses; the last response is returned whatever its status"""
+        host = self.client.build_request(method, url).url.host
+        for attempt in range(self.cfg.retries + 1):
+            await self.rate_limiter.wait(host)
+            try:
+                async with self.host_slots[host]:
+                    response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if attempt == self.cfg.retries:
+                    raise
+                print(f"Retrying {url} after {e!r}")
+            else:
+                if (
+                    response.status_code not in RETRY_STATUSES
+                    or attempt == self.cfg.retries
+                ):
+                    return response
+                print(f"Retrying {url} - Status code: {response.status_code}")
+            await asyncio.sleep(self.backoff(attempt))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    @staticmethod
+    def unique_path(url: str, save_path: Path) -> Path:
+        """Save path of a single URL. Table rows often share a name, e.g.
+        hundreds of "Сообщение" rows, so a short hash of the URL is appended."""
+        digest = hashlib.sha256(url.encode()).hexdigest()[:10]
+        return save_path.with_name(f"{save_path.name} [{digest}]")
+
+    @staticmethod
+    def range_validator(headers: httpx.Headers) -> str | None:
+        """Validator for resuming this response with If-Range; weak ETags are
+        not allowed there"""
+        etag = headers.get("ETag")
+        if etag and not etag.startswith("W/"):
+            return etag
+        return headers.get("Last-Modified")
+
+    async def stream_to(
+        self, url: str, part_path: Path, headers: dict[str, str] | None = None
+    ) -> tuple[int, httpx.Headers]:
+        """Streams the body into `part_path` chunk by chunk and returns the
+        final status and response headers.
+
+        A partial file left by an interrupted attempt or an earlier run is
+        resumed with a Range request and If-Range set to the validator of the
+        response it was started from, so a document that changed in between
+        is sent whole and rewritten instead of stitched onto old bytes. A
+        partial file without a validator is started over. Retries resume the
+        same way."""
+        host = self.client.build_request("GET", url).url.host
+        validator_path = part_path.with_name(part_path.name + VALIDATOR_SUFFIX)
+        for attempt in range(self.cfg.retries + 1):
+            await self.rate_limiter.wait(host)
+            offset = part_path.stat().st_size if part_path.exists() else 0
+            validator = validator_path.read_text() if validator_path.exists() else None
+            if offset and not validator:
+                part_path.unlink()
+                offset = 0
+            request_headers = dict(headers or {})
+            if offset:
+                request_headers["Range"] = f"bytes={offset}-"
+                request_headers["If-Range"] = validator
+            try:
+                async with self.host_slots[host], self.client.stream(
+                    "GET", url, headers=request_headers
+                ) as response:
+                    status = response.status_code
+                    if status == 416 and offset:
+                        # nothing left past the offset, the file is complete
+                        validator_path.unlink(missing_ok=True)
+                        return 200, response.headers
+                    if status == 206 and not response.headers.get(
+                        "Content-Range", ""
+                    ).startswith(f"bytes {offset}-"):
+                        print(f"Restarting {url} - unexpected Content-Range")
+                        part_path.unlink()
+                        validator_path.unlink(missing_ok=True)
+                    elif status in (200, 206):
+                        if status == 200:
+                            # kept until the body is complete, to resume it later
+                            validator = self.range_validator(response.headers)
+                            if validator:
+                                validator_path.write_text(validator)
+                            else:
+                                validator_path.unlink(missing_ok=True)
+                        with part_path.open("ab" if status == 206 else "wb") as f:
+                            async for chunk in response.aiter_bytes(self.cfg.chunk_size):
+                                f.write(chunk)
+                        validator_path.unlink(missing_ok=True)
+                        return status, response.headers
+                    elif status not in RETRY_STATUSES or attempt == self.cfg.retries:
+                        return status, response.headers
+                    else:
+                        print(f"Retrying {url} - Status code: {status}")
+            except httpx.TransportError as e:
+                if attempt == self.cfg.retries:
+                    raise
+                print(f"Retrying {url} after {e!r}")
+            await asyncio.sleep(self.backoff(attempt))
+        # only reached when the last attempt got a mismatched range
+        raise IncompleteDownload(f"No consistent range for {url}")
+
+    @staticmethod
+    def list_legacy_files(directory: Path) -> dict[Path, Path]:
+        """Complete files of a directory by their name without suffix"""
+        if not directory.is_dir():
+            return {}
+        return {
+            path.with_suffix(""): path
+            for path in directory.iterdir()
+            if path.suffix not in (PARTIAL_SUFFIX, VALIDATOR_SUFFIX) and path.is_file()
+        }
+
+    async def adopt(self, url: str, save_path: Path) -> ManifestEntry | None:
+        """Records a file downloaded before the manifest existed, so that the
+        archive is not fetched again; only runs for URLs the manifest lacks.
+
+        Files were named <save path>.<extension> back then, shared by every
+        row with the same name, so a file is only adopted when no other URL
+        of the crawl maps to that name and no other URL owns it already.
+        Every directory is listed once, off the event loop, and then looked
+        up in memory."""
+        legacy_name = save_path.with_suffix("")
+        if legacy_name in self.shared_names:
+            return None
+        directory = save_path.parent
+        async with self.legacy_locks[directory]:
+            if directory not in self.legacy_files:
+                self.legacy_files[directory] = await asyncio.to_thread(
+                    self.list_legacy_files, directory
+                )
+        legacy = self.legacy_files[directory].get(legacy_name)
+        if legacy is None or self.manifest.owners(legacy) - {url}:
+            return None
+        sha256 = await asyncio.to_thread(Manifest.file_hash, legacy)
+        return self.manifest.put(url, legacy, sha256, size=legacy.stat().st_size)
+
+    async def download(self, url: str, save_path: Path) -> Path | None:
+        """Download the file from the given URL and save it to the specified path.
+
+        Known documents are looked up in the manifest and, with `revalidate`,
+        requested again with their validators so that only new or changed
+        documents are transferred. The body is streamed into a partial file
+        next to the target, the type is detected from its first bytes, and
+        the file is renamed to its final extension only once it is complete.
+
+        Rows of a table often share a name, so the file is stored under the
+        name plus a short hash of its URL (see `unique_path`)."""
+        target = self.unique_path(url, save_path)
+        part_path = target.with_name(target.name + PARTIAL_SUFFIX)
+        # the same link listed twice must not write one partial file at once
+        async with self.path_locks[part_path]:
+            try:
+                return await self.fetch_document(url, save_path, target, part_path)
+            except (httpx.HTTPError, OSError, IncompleteDownload) as e:
+                # the partial file is kept and resumed by the next crawl
+                print(f"Failed to download {url} - {e!r}")
+                entry = self.manifest.get(url)
+                if entry is not None and entry.path is not None:
+                    stored = Path(entry.path)
+                    return stored if stored.exists() else None
+                return None
+
+    async def fetch_document(
+        self, url: str, save_path: Path, target: Path, part_path: Path
+    ) -> Path | None:
+        entry = self.manifest.get(url) or await self.adopt(url, save_path)
+        stored = None
+        if entry is not None and entry.path is not None and Path(entry.path).exists():
+            stored = Path(entry.path)
+        if stored is not None and not self.cfg.revalidate:
+            print(f"File already exists: {stored}")
+            return stored
+
+        # Ensure the directory exists
+        target.parent.mkdir(parents=True, exist_ok=True)
+        headers = entry.conditional_headers() if stored is not None else {}
+        async with self.semaphore:  # Limit concurrency
+            status, response_headers = await self.stream_to(url, part_path, headers)
+        if status == 304 and stored is not None:
+            self.manifest.touch(url)
+            print(f"Not modified: {stored}")
+            return stored
+        if status not in (200, 206):
+            print(f"Failed to download {url} - Status code: {status}")
+            return stored
+
+        sha256 = await asyncio.to_thread(Manifest.file_hash, part_path)
+        if stored is not None and sha256 == entry.sha256:
+            # the server sent the same content without honouring the validators
+            part_path.unlink()
+            save_path = stored
+            print(f"Unchanged: {stored}")
+        else:
+            # Detect file type and determine extension
+            with part_path.open("rb") as f:
+                extension = sniff_extension(f.read(self.cfg.sniff_bytes))
+
+            # Append the extension, names often contain dots of dates; the
+            # rename is atomic
+            save_path = target.with_name(f"{target.name}.{extension}")
+            part_path.replace(save_path)
+            # a file still recorded for another URL is left to that URL
+            if (
+                stored is not None
+                and stored != save_path
+                and not self.manifest.owners(stored) - {url}
+            ):
+                stored.unlink(missing_ok=True)
+            print(f"Downloaded {save_path}")
+
+        self.manifest.put(
+            url,
+            save_path,
+            sha256,
+            response_headers.get("ETag"),
+            response_headers.get("Last-Modified"),
+            save_path.stat().st_size,
+        )
+        return save_path
+
+    async def fetch_page(self, url: str, cache_path: Path) -> bytes:
+        """Returns the page, revalidating the cached copy with a conditional
+        GET instead of keeping it forever"""
+        entry = self.manifest.get(url)
+        cached = entry is not None and entry.path is not None and Path(entry.path).exists()
+        response = await self.get(
+            url, headers=entry.conditional_headers() if cached else {}
+        )
+        if response.status_code == 304 and cached:
+            self.manifest.touch(url)
+            return Path(entry.path).read_bytes()
+        response.raise_for_status()
+
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        part_path = cache_path.with_name(cache_path.name + PARTIAL_SUFFIX)
+        part_path.write_bytes(response.content)
+        part_path.replace(cache_path)
+        self.manifest.put(
+            url,
+            cache_path,
+            hashlib.sha256(response.content).hexdigest(),
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            len(response.content),
+        )
+        return response.content
+
+    async def download_all(self, tasks: list[tuple[str, Path]]) -> list[Path | None]:
+        """Runs all downloads at once; the semaphore bounds the parallelism.
+
+        A link listed more than once is downloaded once and its path is
+        returned for every occurrence."""
+        unique_tasks = list(dict.fromkeys(tasks))
+        names = Counter(save_path.with_suffix("") for _, save_path in unique_tasks)
+        self.shared_names |= {name for name, count in names.items() if count > 1}
+        paths = await asyncio.gather(
+            *(self.download(url, save_path) for url, save_path in unique_tasks)
+        )
+        results = dict(zip(unique_tasks, paths))
+        return [results[task] for task in tasks]
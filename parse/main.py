@@ -1,151 +1,237 @@
+import argparse
 import asyncio
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-import bs4
-from httpx import AsyncClient
-from datetime import datetime
-import pandas as pd
-import re
-import magic  # python-magic for file type detection
+from urllib.parse import urlsplit
+
+from columnar import ColumnarConfig, ColumnarWriter
+from crawler import Crawler, CrawlerConfig
+from downloader import DownloadConfig, Downloader
+from pipeline import Pipeline, PipelineConfig, PipelineDownloader
+from tables import parse_tables, write_excel
 
 main_url = "https://www.disclosure.ru/issuer/7740000076/"
 
-client = AsyncClient()
-
-# Semaphore to limit the number of concurrent downloads
-download_semaphore = asyncio.Semaphore(5)  # Set to desired concurrency limit
-
-
-async def download_file(url, save_path):
-    """Download the file from the given URL and save it to the specified path."""
-    # Check if any file with the base name already exists
-    existing_files = list(save_path.parent.glob(f"{save_path.stem}.*"))
-    if existing_files:
-        print(f"File already exists: {existing_files[0]}")
-        return
-    async with download_semaphore:  # Limit concurrency
-        response = await client.get(url)
-        if response.status_code == 200:
-            # Detect file type and determine extension
-            mime = magic.Magic(mime=True)
-            content_type = mime.from_buffer(response.content)
-            extension = content_type.split("/")[
-                -1
-            ]  # Get the extension based on MIME type
-
-            # Append the extension to the save path
-            save_path = save_path.with_suffix(f".{extension}")
-
-            # Ensure the directory exists
-            save_path.parent.mkdir(parents=True, exist_ok=True)
-
-            # Save the file
-            with save_path.open("wb") as f:
-                f.write(response.content)
-            print(f"Downloaded {save_path}")
-        else:
-            print(f"Failed to download {url} - Status code: {response.status_code}")
-
-
-async def main():
-    main_page_html_path = Path("main.html")
-    if not main_page_html_path.exists():
-        main_page = await client.get(main_url)
-        main_page_html = main_page.content
-        with main_page_html_path.open("wb") as f:
-            f.write(main_page_html)
-    with main_page_html_path.open("r") as f:
-        main_page_html = f.read()
-    soup = bs4.BeautifulSoup(main_page_html, "html.parser")
-
-    # Dictionary to hold table data for each sheet
-    tables_data = {}
-
-    # Iterate over all tables in the parsed HTML
-    for idx, table in enumerate(soup.find_all("table", class_="doctable")):
-        # Find label above the table
-        label = None
-        previous_sibling = table.find_previous_sibling()
-        while previous_sibling:
-            if previous_sibling.name == "b":
-                u_tag = previous_sibling.find("u")
-                if u_tag:
-                    label = u_tag.get_text(strip=True)
-                    break
-            previous_sibling = previous_sibling.find_previous_sibling()
-
-        # Default to "Table {idx + 1}" if no label is found
-        label = label or f"Table {idx + 1}"
-
-        # Clean the label for sheet naming
-        clean_label = re.sub(r"[:\/\\\?\*\[\]]", "", label)[:31]
-
-        # Get the header from the first row
-        first_row = table.find("tr")
-        headers = []
-        if first_row:
-            headers = [
-                header.get_text(strip=True) for header in first_row.find_all("th")
-            ]
-            if not headers:  # If no <th> headers, use <td> from the first row
-                headers = [
-                    cell.get_text(strip=True) for cell in first_row.find_all("td")
-                ]
-
-        # Identify "Дата" columns
-        date_columns = [i for i, header in enumerate(headers) if "Дата" in header]
-
-        # Collect rows of data
-        rows_data = []
-        download_tasks = []
-        for row in table.find_all("tr")[1:]:  # Skip the header row
-            cells = row.find_all(["td", "th"])
-            row_data = []
-            for i, cell in enumerate(cells):
-                save_path = None
-                # Check if the cell contains a link
-                link = cell.find("a")
-                if link and link.has_attr("href"):
-                    cell_text = link["href"]
-                    # Schedule the download if it's in the last column and has a URL
-                    if i == len(cells) - 1:
-                        second_column_value = (
-                            cells[1].get_text(strip=True) if len(cells) > 1 else "file"
-                        )
-                        save_path = Path(
-                            f"documents/{clean_label}/{second_column_value[:100]}"
-                        )
-                        download_tasks.append((cell_text, save_path))
-                else:
-                    cell_text = cell.get_text(strip=True)
-                    # Parse as datetime if column is a "Дата" column
-                    if i in date_columns:
-                        try:
-                            cell_text = datetime.strptime(cell_text, "%d.%m.%Y").date()
-                        except ValueError:
-                            pass  # Leave cell_text as is if parsing fails
-                row_data.append(cell_text)
-                if save_path:
-                    row_data.append(save_path)
-            rows_data.append(row_data)
-
-        # Create a DataFrame for the table
-        df = pd.DataFrame(rows_data, columns=headers + ["Path"])
-        tables_data[clean_label] = (
-            df  # Store the DataFrame with the cleaned label as the key
+
+@asynccontextmanager
+async def open_downloader(
+    cfg: DownloadConfig, pipeline_cfg: PipelineConfig | None = None
+):
+    """A plain downloader, or one that feeds every downloaded document into
+    table extraction and waits for the extraction to finish on exit"""
+    if pipeline_cfg is None:
+        async with Downloader(cfg) as downloader:
+            yield downloader
+    else:
+        async with Pipeline(pipeline_cfg) as pipeline:
+            async with PipelineDownloader(pipeline, cfg) as downloader:
+                yield downloader
+
+
+async def main(
+    url: str = main_url,
+    cfg: DownloadConfig = DownloadConfig(),
+    parser: str = "forward",
+    columnar: ColumnarConfig | None = None,
+    pipeline_cfg: PipelineConfig | None = None,
+):
+    async with open_downloader(cfg, pipeline_cfg) as downloader:
+        await crawl(url, downloader, parser, columnar)
+
+
+async def main_issuers(
+    issuer_ids: list[str],
+    cfg: DownloadConfig = DownloadConfig(),
+    crawler_cfg: CrawlerConfig = CrawlerConfig(),
+    output_dir: Path = Path("tables"),
+    columnar: ColumnarConfig | None = None,
+    pipeline_cfg: PipelineConfig | None = None,
+):
+    async with open_downloader(cfg, pipeline_cfg) as downloader:
+        await crawl_issuers(
+            issuer_ids, Crawler(downloader, crawler_cfg), output_dir, columnar
         )
 
-        # Execute download tasks sequentially to respect semaphore limits
-        for url, path in download_tasks:
-            await download_file(url, path)
 
-    # Write all tables to an Excel file with each sheet named after the cleaned label
-    output_path = "tables_data.xlsx"
-    with pd.ExcelWriter(output_path) as writer:
-        for label, df in tables_data.items():
-            df.to_excel(writer, sheet_name=label, index=False)
+async def crawl_issuers(
+    issuer_ids: list[str],
+    crawler: Crawler,
+    output_dir: Path,
+    columnar: ColumnarConfig | None = None,
+):
+    """Writes the tables of every issuer as soon as its crawl is complete,
+    as <issuer>.xlsx in output_dir or into the columnar dataset"""
+    writer = ColumnarWriter(columnar) if columnar is not None else None
+    output_dir.mkdir(parents=True, exist_ok=True)
+    async for result in crawler.crawl(issuer_ids):
+        if result.error is not None:
+            print(f"Failed to crawl {result.url} - {result.error}")
+        else:
+            if writer is not None:
+                output_path = await asyncio.to_thread(
+                    writer.write_issuer, result.issuer_id, result.tables
+                )
+            else:
+                output_path = output_dir / f"{result.issuer_id}.xlsx"
+                await asyncio.to_thread(write_excel, result.tables, output_path)
+            print(f"Data of {result.issuer_id} has been saved to {output_path}")
+        print(crawler.metrics.progress())
+
+
+def issuer_id(url: str) -> str:
+    return urlsplit(url).path.rstrip("/").split("/")[-1]
+
+
+async def crawl(
+    url: str,
+    downloader: Downloader,
+    parser: str = "forward",
+    columnar: ColumnarConfig | None = None,
+):
+    # Revalidated on every run, so new filings are picked up
+    main_page_html = await downloader.fetch_page(url, Path("main.html"))
+    tables_data, download_tasks = parse_tables(
+        main_page_html, url, mode=parser
+    )
+
+    # Download concurrently; the downloader bounds the parallelism
+    start = time.perf_counter()
+    saved = await downloader.download_all(download_tasks)
+    print(
+        f"Downloaded {sum(path is not None for path in saved)} of "
+        f"{len(download_tasks)} files in {time.perf_counter() - start:.1f} s"
+    )
+
+    if columnar is not None:
+        output_path = ColumnarWriter(columnar).write_issuer(issuer_id(url), tables_data)
+    else:
+        output_path = "tables_data.xlsx"
+        write_excel(tables_data, output_path)
 
     print(f"Data has been saved to {output_path}")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=main_url)
+    parser.add_argument(
+        "--issuers", nargs="*", default=[], help="issuer IDs to crawl instead of --url"
+    )
+    parser.add_argument(
+        "--issuers-file", type=Path, default=None, help="one issuer ID per line"
+    )
+    parser.add_argument("--base-url", default=CrawlerConfig.base_url)
+    parser.add_argument("--workers", type=int, default=CrawlerConfig.workers)
+    parser.add_argument("--rebase-links", action="store_true")
+    parser.add_argument(
+        "--parser", choices=["forward", "siblings"], default=CrawlerConfig.parser
+    )
+    parser.add_argument("--output-dir", type=Path, default=Path("tables"))
+    parser.add_argument(
+        "--output-format",
+        choices=["excel", "parquet", "arrow"],
+        default="excel",
+        help="parquet and arrow write a dataset partitioned by issuer and section "
+        "under --output-dir",
+    )
+    parser.add_argument("--concurrency", type=int, default=DownloadConfig.concurrency)
+    parser.add_argument(
+        "--max-connections", type=int, default=DownloadConfig.max_connections
+    )
+    parser.add_argument("--timeout", type=float, default=DownloadConfig.timeout)
+    parser.add_argument("--retries", type=int, default=DownloadConfig.retries)
+    parser.add_argument(
+        "--requests-per-second",
+        type=float,
+        default=DownloadConfig.requests_per_second,
+    )
+    parser.add_argument(
+        "--max-per-host", type=int, default=DownloadConfig.max_per_host
+    )
+    parser.add_argument(
+        "--manifest", type=Path, default=DownloadConfig.manifest_path
+    )
+    parser.add_argument(
+        "--no-revalidate",
+        dest="revalidate",
+        action="store_false",
+        help="skip documents already in the manifest without a request",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="extract the tables of every PDF as soon as it is downloaded",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=PipelineConfig.queue_size,
+        help="documents downloaded ahead of extraction",
+    )
+    parser.add_argument("--extractors", type=int, default=PipelineConfig.extractors)
+    parser.add_argument(
+        "--page-workers", type=int, default=PipelineConfig.page_workers
+    )
+    parser.add_argument(
+        "--pipeline-state", type=Path, default=PipelineConfig.state_path
+    )
+    parser.add_argument(
+        "--extracted-dir", type=Path, default=PipelineConfig.output_dir
+    )
+    parser.add_argument(
+        "--extraction-python",
+        default=PipelineConfig.python,
+        help="interpreter of the smart-extraction environment (Python <3.12)",
+    )
+    parser.add_argument(
+        "--extraction-dir", type=Path, default=PipelineConfig.extraction_dir
+    )
+    args = parser.parse_args()
+
+    cfg = DownloadConfig(
+        concurrency=args.concurrency,
+        max_connections=args.max_connections,
+        timeout=args.timeout,
+        retries=args.retries,
+        requests_per_second=args.requests_per_second,
+        max_per_host=args.max_per_host,
+        manifest_path=args.manifest,
+        revalidate=args.revalidate,
+    )
+    columnar = None
+    if args.output_format != "excel":
+        columnar = ColumnarConfig(path=args.output_dir, format=args.output_format)
+    pipeline_cfg = None
+    if args.pipeline:
+        pipeline_cfg = PipelineConfig(
+            queue_size=args.queue_size,
+            extractors=args.extractors,
+            page_workers=args.page_workers,
+            state_path=args.pipeline_state,
+            output_dir=args.extracted_dir,
+            python=args.extraction_python,
+            extraction_dir=args.extraction_dir,
+        )
+    issuer_ids = list(args.issuers)
+    if args.issuers_file is not None:
+        issuer_ids += args.issuers_file.read_text().split()
+
+    if issuer_ids:
+        asyncio.run(
+            main_issuers(
+                issuer_ids,
+                cfg,
+                CrawlerConfig(
+                    base_url=args.base_url,
+                    workers=args.workers,
+                    rebase_links=args.rebase_links,
+                    parser=args.parser,
+                ),
+                args.output_dir,
+                columnar,
+                pipeline_cfg,
+            )
+        )
+    else:
+        asyncio.run(main(args.url, cfg, args.parser, columnar, pipeline_cfg))
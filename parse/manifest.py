@@ -0,0 +1,119 @@
+import hashlib
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass
+class ManifestEntry:
+    url: str
+    path: str | None
+    sha256: str | None
+    etag: str | None
+    last_modified: str | None
+    size: int | None
+    fetched_at: float
+
+    def conditional_headers(self) -> dict[str, str]:
+        """Validators of the stored copy for a conditional GET"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class Manifest:
+    """Everything fetched by the crawler, keyed by URL: where it is stored,
+    its content hash and the validators the server sent with it."""
+
+    def __init__(self, path: Path = Path("manifest.sqlite3")):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                url TEXT PRIMARY KEY,
+                path TEXT,
+                sha256 TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS documents_path ON documents (path)"
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def file_hash(path: Path, chunk_size: int = 1024 * 1024) -> str:
+        digest = hashlib.sha256()
+        with path.open("rb") as f:
+            while chunk := f.read(chunk_size):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, url: str) -> ManifestEntry | None:
+        row = self.connection.execute(
+            "SELECT * FROM documents WHERE url = ?", (url,)
+        ).fetchone()
+        return None if row is None else ManifestEntry(*row)
+
+    def owners(self, path: Path) -> set[str]:
+        """URLs recorded as stored at `path`; more than one only in manifests
+        written before file names were made unique per URL"""
+        rows = self.connection.execute(
+            "SELECT url FROM documents WHERE path = ?", (str(path),)
+        ).fetchall()
+        return {url for (url,) in rows}
+
+    def put(
+        self,
+        url: str,
+        path: Path | None,
+        sha256: str | None = None,
+        etag: str | None = None,
+        last_modified: str | None = None,
+        size: int | None = None,
+    ) -> ManifestEntry:
+        entry = ManifestEntry(
+            url=url,
+            path=None if path is None else str(path),
+            sha256=sha256,
+            etag=etag,
+            last_modified=last_modified,
+            size=size,
+            fetched_at=time.time(),
+        )
+        self.connection.execute(
+            "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                entry.url,
+                entry.path,
+                entry.sha256,
+                entry.etag,
+                entry.last_modified,
+                entry.size,
+                entry.fetched_at,
+            ),
+        )
+        self.connection.commit()
+        return entry
+
+    def touch(self, url: str):
+        """Marks a stored copy as confirmed unchanged"""
+        self.connection.execute(
+            "UPDATE documents SET fetched_at = ? WHERE url = ?", (time.time(), url)
+        )
+        self.connection.commit()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,351 @@
+import asyncio
+import json
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pandas as pd
+
+from downloader import DownloadConfig, Downloader
+from manifest import Manifest
+from tables import write_excel
+
+
+@dataclass
+class PipelineConfig:
+    # documents downloaded but not yet extracted; downloads wait once it is full
+    queue_size: int = 8
+    # documents extracted at once; more than one only pays off together with
+    # page_workers > 1, which spreads the pages over worker processes
+    extractors: int = 1
+    page_workers: int = 1
+    # extraction state, a document is only extracted again when its hash changed
+    state_path: Path = Path("pipeline.sqlite3")
+    documents_dir: Path = Path("documents")
+    # tables of documents/<path>.pdf are written to extracted/<path>.xlsx and
+    # the text of its pages to extracted/<path>.txt
+    output_dir: Path = Path("extracted")
+    suffixes: tuple[str, ...] = (".pdf",)
+    # smart-extraction needs Python <3.12 and the crawler >=3.12, so extraction
+    # runs in worker processes started with the interpreter of its environment,
+    # e.g. `poetry env info -e` in smart-extraction; the pipeline refuses to
+    # start when the workers cannot import it
+    python: str = "python"
+    extraction_dir: Path = Path("../smart-extraction")
+    # longest response line accepted from a worker
+    max_response_size: int = 256 * 1024 * 1024
+
+
+@dataclass
+class PipelineMetrics:
+    queued: int = 0
+    extracted: int = 0
+    skipped: int = 0
+    failed: int = 0
+    tables: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def documents_per_hour(self) -> float:
+        return 3600 * self.extracted / self.elapsed if self.elapsed else 0.0
+
+    def progress(self) -> str:
+        return (
+            f"[pipeline] {self.extracted} extracted, {self.skipped} already done, "
+            f"{self.failed} failed, {self.queued} waiting, {self.tables} tables, "
+            f"{self.documents_per_hour:.1f} documents/h"
+        )
+
+
+class PipelineState:
+    """Extraction status of every document, keyed by path and content hash,
+    so that a restarted pipeline skips what it already finished."""
+
+    def __init__(self, path: Path = Path("pipeline.sqlite3")):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extractions (
+                path TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                status TEXT NOT NULL,
+                tables INTEGER,
+                output TEXT,
+                text TEXT,
+                error TEXT,
+                seconds REAL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self.connection.commit()
+
+    def done(self, path: Path, sha256: str) -> bool:
+        row = self.connection.execute(
+            "SELECT sha256, status FROM extractions WHERE path = ?", (str(path),)
+        ).fetchone()
+        return row is not None and row == (sha256, "done")
+
+    def put(
+        self,
+        path: Path,
+        sha256: str,
+        status: str,
+        tables: int | None = None,
+        output: Path | None = None,
+        text: Path | None = None,
+        error: str | None = None,
+        seconds: float | None = None,
+    ):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                str(path),
+                sha256,
+                status,
+                tables,
+                None if output is None else str(output),
+                None if text is None else str(text),
+                error,
+                seconds,
+                time.time(),
+            ),
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+class ExtractionWorker:
+    """A `python -m tables_extraction.worker` process that keeps the models
+    loaded between documents and is restarted if it dies"""
+
+    def __init__(self, cfg: PipelineConfig):
+        self.cfg = cfg
+        self.process: asyncio.subprocess.Process | None = None
+
+    async def start(self):
+        """Starts the worker and waits until it has imported the pipeline, so
+        that a wrong interpreter fails at once instead of on every document"""
+        self.process = await asyncio.create_subprocess_exec(
+            self.cfg.python,
+            "-m",
+            "tables_extraction.worker",
+            cwd=self.cfg.extraction_dir,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=self.cfg.max_response_size,
+        )
+        line = await self.process.stdout.readline()
+        try:
+            response = json.loads(line) if line else {}
+        except json.JSONDecodeError:
+            response = {"error": line.decode(errors="replace").strip()}
+        if not response.get("ready"):
+            await self.close(kill=True)
+            raise RuntimeError(
+                f"{self.cfg.python} cannot run tables_extraction.worker in "
+                f"{self.cfg.extraction_dir}: {response.get('error', 'worker exited')}. "
+                "Pass the interpreter of the smart-extraction environment "
+                "(Python <3.12) as --extraction-python"
+            )
+
+    async def extract(
+        self, pdf_path: Path
+    ) -> tuple[list[pd.DataFrame | None], list[str | None]]:
+        """Tables and text of every page"""
+        if self.process is None or self.process.returncode is not None:
+            await self.start()
+        # the worker runs in extraction_dir
+        request = {"pdf": str(pdf_path.resolve()), "workers": self.cfg.page_workers}
+        self.process.stdin.write(json.dumps(request).encode() + b"\n")
+        await self.process.stdin.drain()
+
+        line = await self.process.stdout.readline()
+        if not line:
+            returncode = await self.process.wait()
+            raise RuntimeError(f"Extraction worker exited with code {returncode}")
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        table_dfs = [
+            None if table is None else pd.DataFrame(table["data"], columns=table["columns"])
+            for table in response["tables"]
+        ]
+        return table_dfs, response["texts"]
+
+    async def close(self, kill: bool = False):
+        if self.process is None or self.process.returncode is not None:
+            return
+        if kill:
+            self.process.kill()
+        else:
+            # the worker exits at the end of its input
+            self.process.stdin.close()
+        await self.process.wait()
+
+
+def write_document(
+    table_dfs: list[pd.DataFrame | None],
+    texts: list[str | None],
+    output_path: Path,
+    text_path: Path,
+) -> int:
+    """Writes the tables as one sheet per page and the page texts separated
+    by form feeds; returns the number of tables"""
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    text_path.write_text("\f".join(text or "" for text in texts), encoding="utf-8")
+    tables = {
+        f"Page {number}": df
+        for number, df in enumerate(table_dfs, start=1)
+        if df is not None
+    }
+    if tables:
+        write_excel(tables, output_path)
+    return len(tables)
+
+
+class Pipeline:
+    """Feeds downloaded documents into table extraction while the crawl runs.
+
+    Every download takes a slot before it starts and the slot is given back
+    once the document is extracted, so at most `queue_size` documents are
+    downloaded ahead of the extractors and crawling slows down to the pace
+    of OCR instead of filling the disk."""
+
+    def __init__(self, cfg: PipelineConfig = PipelineConfig()):
+        self.cfg = cfg
+        self.state = PipelineState(cfg.state_path)
+        self.metrics = PipelineMetrics()
+        self.queue: asyncio.Queue[tuple[Path, str]] = asyncio.Queue(cfg.queue_size)
+        self.slots = asyncio.Semaphore(cfg.queue_size)
+        self.extractors: list[asyncio.Task] = []
+        self.workers: list[ExtractionWorker] = []
+
+    def output_path(self, path: Path) -> Path:
+        try:
+            relative = path.relative_to(self.cfg.documents_dir)
+        except ValueError:
+            relative = Path(path.name)
+        return self.cfg.output_dir / relative.with_suffix(".xlsx")
+
+    async def submit(self, path: Path | None, sha256: str | None):
+        """Queues a downloaded document, holding its slot until it is extracted"""
+        if (
+            path is None
+            or sha256 is None
+            or path.suffix.lower() not in self.cfg.suffixes
+        ):
+            self.slots.release()
+            return
+        if self.state.done(path, sha256):
+            self.metrics.skipped += 1
+            self.slots.release()
+            return
+        self.metrics.queued += 1
+        await self.queue.put((path, sha256))
+
+    async def extract(self, worker: ExtractionWorker, path: Path, sha256: str):
+        output_path = self.output_path(path)
+        text_path = output_path.with_suffix(".txt")
+        self.state.put(path, sha256, "running")
+        start = time.perf_counter()
+        try:
+            table_dfs, texts = await worker.extract(path)
+            tables = await asyncio.to_thread(
+                write_document, table_dfs, texts, output_path, text_path
+            )
+        except Exception as e:
+            self.metrics.failed += 1
+            self.state.put(
+                path, sha256, "failed", error=repr(e), seconds=time.perf_counter() - start
+            )
+            print(f"Failed to extract {path} - {e!r}")
+            return
+        self.metrics.extracted += 1
+        self.metrics.tables += tables
+        self.state.put(
+            path,
+            sha256,
+            "done",
+            tables,
+            output_path if tables else None,
+            text_path,
+            seconds=time.perf_counter() - start,
+        )
+        print(f"Extracted {tables} tables from {path}")
+
+    async def extractor(self, worker: ExtractionWorker):
+        while True:
+            path, sha256 = await self.queue.get()
+            self.metrics.queued -= 1
+            try:
+                await self.extract(worker, path, sha256)
+            finally:
+                self.slots.release()
+                self.queue.task_done()
+            print(self.metrics.progress())
+
+    async def __aenter__(self):
+        self.metrics = PipelineMetrics()
+        self.workers = [ExtractionWorker(self.cfg) for _ in range(self.cfg.extractors)]
+        try:
+            await asyncio.gather(*(worker.start() for worker in self.workers))
+        except BaseException:
+            for worker in self.workers:
+                await worker.close(kill=True)
+            self.state.close()
+            raise
+        self.extractors = [
+            asyncio.create_task(self.extractor(worker)) for worker in self.workers
+        ]
+        return self
+
+    async def __aexit__(self, exc_type, *exc_info):
+        try:
+            if exc_type is None:
+                # let the extractors finish everything that was downloaded
+                await self.queue.join()
+        finally:
+            for task in self.extractors:
+                task.cancel()
+            await asyncio.gather(*self.extractors, return_exceptions=True)
+            # a cancelled worker may be in the middle of a document
+            for worker in self.workers:
+                await worker.close(kill=exc_type is not None)
+            self.state.close()
+        print(self.metrics.progress())
+
+
+class PipelineDownloader(Downloader):
+    """Downloader that hands every downloaded document to a pipeline, waiting
+    for a free slot before it starts the transfer."""
+
+    def __init__(
+        self,
+        pipeline: Pipeline,
+        cfg: DownloadConfig = DownloadConfig(),
+        client=None,
+        manifest: Manifest | None = None,
+    ):
+        super().__init__(cfg, client, manifest)
+        self.pipeline = pipeline
+
+    async def download(self, url: str, save_path: Path) -> Path | None:
+        await self.pipeline.slots.acquire()
+        try:
+            path = await super().download(url, save_path)
+        except BaseException:
+            self.pipeline.slots.release()
+            raise
+        entry = self.manifest.get(url)
+        sha256 = entry.sha256 if entry is not None and path is not None else None
+        await self.pipeline.submit(path, sha256)
+        return path
@@ -0,0 +1,243 @@
+import re
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urljoin
+
+import bs4
+import pandas as pd
+
+try:
+    from lxml import html as lxml_html
+except ImportError:  # optional, the forward pass falls back to BeautifulSoup
+    lxml_html = None
+
+# a table cell as (text, href of its first link or None)
+Cell = tuple[str, str | None]
+
+
+def build_table(
+    idx: int,
+    label: str | None,
+    headers: list[str],
+    rows: list[list[Cell]],
+    url: str,
+    documents_dir: Path,
+    download_tasks: list[tuple[str, Path]],
+) -> tuple[str, pd.DataFrame]:
+    """Turns the cells of one doctable into a DataFrame named after its label
+    and schedules the documents linked from its last column"""
+    # Default to "Table {idx + 1}" if no label is found
+    label = label or f"Table {idx + 1}"
+
+    # Clean the label for sheet and file naming; the section keeps it whole,
+    # document folders keep the 31 characters of an Excel sheet name
+    section = re.sub(r"[:\/\\\?\*\[\]]", "", label)
+    clean_label = section[:31]
+
+    # Identify "Дата" columns
+    date_columns = [i for i, header in enumerate(headers) if "Дата" in header]
+
+    # Collect rows of data
+    rows_data = []
+    for cells in rows:
+        row_data = []
+        for i, (text, href) in enumerate(cells):
+            save_path = None
+            # Check if the cell contains a link
+            if href is not None:
+                # Relative links are resolved against the issuer page
+                cell_text = urljoin(url, href)
+                # Schedule the download if it's in the last column and has a URL
+                if i == len(cells) - 1:
+                    second_column_value = cells[1][0] if len(cells) > 1 else "file"
+                    save_path = documents_dir / clean_label / second_column_value[:100]
+                    download_tasks.append((cell_text, save_path))
+            else:
+                cell_text = text
+                # Parse as datetime if column is a "Дата" column
+                if i in date_columns:
+                    try:
+                        cell_text = datetime.strptime(cell_text, "%d.%m.%Y").date()
+                    except ValueError:
+                        pass  # Leave cell_text as is if parsing fails
+            row_data.append(cell_text)
+            if save_path:
+                row_data.append(save_path)
+        rows_data.append(row_data)
+
+    # Create a DataFrame for the table
+    return section, pd.DataFrame(rows_data, columns=headers + ["Path"])
+
+
+def soup_cells(row: bs4.Tag) -> list[Cell]:
+    cells = []
+    for cell in row.find_all(["td", "th"]):
+        link = cell.find("a")
+        href = link["href"] if link is not None and link.has_attr("href") else None
+        cells.append((cell.get_text(strip=True), href))
+    return cells
+
+
+def soup_headers(table: bs4.Tag) -> list[str]:
+    # Get the header from the first row
+    first_row = table.find("tr")
+    headers = []
+    if first_row:
+        headers = [header.get_text(strip=True) for header in first_row.find_all("th")]
+        if not headers:  # If no <th> headers, use <td> from the first row
+            headers = [cell.get_text(strip=True) for cell in first_row.find_all("td")]
+    return headers
+
+
+def parse_tables_siblings(
+    html: bytes | str, url: str, documents_dir: Path = Path("documents")
+) -> tuple[dict[str, pd.DataFrame], list[tuple[str, Path]]]:
+    """Original parser: html.parser, and a backwards walk over the preceding
+    siblings of every table to find its label, quadratic in their number"""
+    soup = bs4.BeautifulSoup(html, "html.parser")
+
+    # Dictionary to hold table data for each sheet
+    tables_data = {}
+    # Downloads of all tables, started together once the page is parsed
+    download_tasks = []
+
+    # Iterate over all tables in the parsed HTML
+    for idx, table in enumerate(soup.find_all("table", class_="doctable")):
+        # Find label above the table
+        label = None
+        previous_sibling = table.find_previous_sibling()
+        while previous_sibling:
+            if previous_sibling.name == "b":
+                u_tag = previous_sibling.find("u")
+                if u_tag:
+                    label = u_tag.get_text(strip=True)
+                    break
+            previous_sibling = previous_sibling.find_previous_sibling()
+
+        rows = [soup_cells(row) for row in table.find_all("tr")[1:]]
+        section, df = build_table(
+            idx, label, soup_headers(table), rows, url, documents_dir, download_tasks
+        )
+        tables_data[section] = df
+
+    return tables_data, download_tasks
+
+
+def parse_tables_soup(
+    html: bytes | str, url: str, documents_dir: Path = Path("documents")
+) -> tuple[dict[str, pd.DataFrame], list[tuple[str, Path]]]:
+    """Forward pass over a BeautifulSoup tree, for when lxml is missing"""
+    soup = bs4.BeautifulSoup(html, "html.parser")
+    tables_data, download_tasks = {}, []
+
+    label, idx = None, 0
+    # <b> and <table> elements in document order
+    for element in soup.find_all(["b", "table"]):
+        if element.name == "b":
+            u_tag = element.find("u")
+            if u_tag and element.find_parent("table", class_="doctable") is None:
+                label = u_tag.get_text(strip=True)
+        elif "doctable" in element.get("class", []):
+            rows = [soup_cells(row) for row in element.find_all("tr")]
+            headers = soup_headers(element)
+            section, df = build_table(
+                idx, label, headers, rows[1:], url, documents_dir, download_tasks
+            )
+            tables_data[section] = df
+            idx += 1
+
+    return tables_data, download_tasks
+
+
+def lxml_text(element) -> str:
+    """Same as BeautifulSoup's get_text(strip=True)"""
+    return "".join(part.strip() for part in element.itertext())
+
+
+def is_doctable(element) -> bool:
+    return element.tag == "table" and "doctable" in (element.get("class") or "").split()
+
+
+def parse_tables_lxml(
+    html: bytes | str, url: str, documents_dir: Path = Path("documents")
+) -> tuple[dict[str, pd.DataFrame], list[tuple[str, Path]]]:
+    """Forward pass over an lxml tree"""
+    root = lxml_html.fromstring(html)
+    tables_data, download_tasks = {}, []
+
+    label, idx = None, 0
+    # <b> and <table> elements in document order
+    for element in root.iter("b", "table"):
+        if element.tag == "b":
+            u_tag = next(element.iter("u"), None)
+            if u_tag is not None and not any(
+                is_doctable(ancestor) for ancestor in element.iterancestors("table")
+            ):
+                label = lxml_text(u_tag)
+        elif is_doctable(element):
+            rows = []
+            for row in element.iter("tr"):
+                cells = []
+                for cell in row.iter("td", "th"):
+                    link = next(cell.iter("a"), None)
+                    href = None if link is None else link.get("href")
+                    cells.append((lxml_text(cell), href))
+                rows.append(cells)
+
+            headers = []
+            if rows:
+                first_row = next(element.iter("tr"))
+                headers = [lxml_text(header) for header in first_row.iter("th")]
+                if not headers:  # If no <th> headers, use <td> from the first row
+                    headers = [lxml_text(cell) for cell in first_row.iter("td")]
+
+            section, df = build_table(
+                idx, label, headers, rows[1:], url, documents_dir, download_tasks
+            )
+            tables_data[section] = df
+            idx += 1
+
+    return tables_data, download_tasks
+
+
+def parse_tables(
+    html: bytes | str,
+    url: str,
+    documents_dir: Path = Path("documents"),
+    mode: str = "forward",
+) -> tuple[dict[str, pd.DataFrame], list[tuple[str, Path]]]:
+    """Parses every doctable of an issuer page into a DataFrame keyed by its
+    cleaned, untruncated label, and lists the (url, save path) of the documents it links to.
+
+    "forward" walks the document once, taking the most recent <b><u> label
+    outside of a doctable as the label of the next table, with lxml when it
+    is installed. "siblings" is the original backwards sibling search."""
+    if mode == "forward":
+        if lxml_html is not None:
+            return parse_tables_lxml(html, url, documents_dir)
+        return parse_tables_soup(html, url, documents_dir)
+    if mode == "siblings":
+        return parse_tables_siblings(html, url, documents_dir)
+    raise ValueError(f"Unknown parsing mode: {mode}")
+
+
+def sheet_names(labels: list[str]) -> list[str]:
+    """Excel caps sheet names at 31 characters; labels that only differ past
+    that get a numeric suffix instead of overwriting each other"""
+    names, used = [], set()
+    for label in labels:
+        name, number = label[:31], 1
+        while name in used:
+            number += 1
+            suffix = f" ({number})"
+            name = label[: 31 - len(suffix)] + suffix
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def write_excel(tables_data: dict[str, pd.DataFrame], output_path: Path | str):
+    """Write all tables to an Excel file with each sheet named after the cleaned label"""
+    with pd.ExcelWriter(output_path) as writer:
+        for sheet_name, df in zip(sheet_names(list(tables_data)), tables_data.values()):
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
@@ -0,0 +1,69 @@
+"""Compares the full and fast deskew modes on real scans.
+
+    python -m benchmarks.deskew scans.pdf --max-pages 50
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+from deskew import determine_skew
+
+from tables_extraction.processing import ImageProcessor, RenderConfig
+from tables_extraction.processing.deskewer import (
+    DeskewConfig,
+    deskew,
+    deskew_fast,
+    estimate_skew_fast,
+    to_grayscale,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf_path")
+    parser.add_argument("--max-pages", type=int, default=None)
+    parser.add_argument("--max-size", type=int, default=DeskewConfig.max_size)
+    parser.add_argument("--min-angle", type=float, default=DeskewConfig.min_angle)
+    args = parser.parse_args()
+
+    cfg = DeskewConfig(mode="fast", max_size=args.max_size, min_angle=args.min_angle)
+
+    full_times, fast_times, differences = [], [], []
+    rotated = 0
+    for page in ImageProcessor.iter_pdf_path_pages(
+        args.pdf_path, RenderConfig(last_page=args.max_pages)
+    ):
+        array = np.array(page)
+
+        start = time.perf_counter()
+        deskew(array)
+        full_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        _, angle = deskew_fast(array, cfg)
+        fast_times.append(time.perf_counter() - start)
+        rotated += angle != 0
+
+        full_angle = determine_skew(to_grayscale(array)) or 0.0
+        differences.append(abs(full_angle - estimate_skew_fast(array, cfg)))
+
+    pages = len(full_times)
+    print(f"pages            : {pages}, rotated in fast mode: {rotated}")
+    print(f"full, ms/page    : {1000 * statistics.mean(full_times):8.1f}")
+    print(f"fast, ms/page    : {1000 * statistics.mean(fast_times):8.1f}")
+    print(
+        "saved, ms/page   : "
+        f"{1000 * (statistics.mean(full_times) - statistics.mean(fast_times)):8.1f}"
+    )
+    print(f"angle diff, mean : {statistics.mean(differences):8.2f} deg")
+    print(f"angle diff, max  : {max(differences):8.2f} deg")
+    print(
+        "within 0.5 deg   : "
+        f"{sum(d <= 0.5 for d in differences) / pages:8.1%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
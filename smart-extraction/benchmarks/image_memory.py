@@ -0,0 +1,121 @@
+"""Compares memory and time of the PIL image path with the uint8 array path.
+
+The old path converted and cropped PIL images and copied every cell crop
+into numpy twice; the array path keeps the rendered page and takes table
+and cell crops as views. Models are not run, the table is assumed to cover
+the middle of the page and is split into a regular grid.
+
+    python -m benchmarks.image_memory report.pdf --rows 30 --columns 8
+"""
+
+import argparse
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from tables_extraction.processing import ImageProcessor, RenderConfig, TableGrid
+from tables_extraction.processing.deskewer import DeskewConfig, deskew_array, deskew_pil
+
+
+def regular_grid(size: tuple[int, int], rows: int, columns: int) -> TableGrid:
+    width, height = size
+    ys = np.linspace(0, height, rows + 1, dtype=np.float32)
+    xs = np.linspace(0, width, columns + 1, dtype=np.float32)
+    row_boxes = np.stack(
+        [np.zeros(rows), ys[:-1], np.full(rows, width), ys[1:]], axis=1
+    )
+    column_boxes = np.stack(
+        [xs[:-1], np.zeros(columns), xs[1:], np.full(columns, height)], axis=1
+    )
+    return TableGrid.from_boxes(
+        row_boxes, column_boxes, np.ones(rows), np.ones(columns)
+    )
+
+
+def pil_bytes(image: Image.Image) -> int:
+    """PIL buffers are not seen by tracemalloc, so they are counted by hand"""
+    return image.width * image.height * len(image.getbands())
+
+
+def legacy_padding(image: np.ndarray, padding: int) -> np.ndarray:
+    height, width = image.shape[:2]
+    padded = np.ones((height + 2 * padding, width + 2 * padding, 3)) * 255
+    padded[padding : padding + height, padding : padding + width] = image
+    return padded
+
+
+def pil_path(page: Image.Image, layout: tuple, args, cfg: DeskewConfig) -> int:
+    allocated = 0
+    page = deskew_pil(page, cfg)
+    if page.mode != "RGB":
+        page = page.convert("RGB")
+        allocated += pil_bytes(page)
+    table_image = page.crop(layout)
+    allocated += pil_bytes(table_image)
+
+    grid = regular_grid(table_image.size, args.rows, args.columns)
+    for row_cells in grid.cells:
+        for cell in row_cells:
+            cell_image = np.array(table_image.crop(tuple(cell.tolist())))
+            cell_image = np.array(cell_image)
+            allocated += 2 * cell_image.nbytes
+    allocated += legacy_padding(np.asarray(table_image), args.padding).nbytes
+    return allocated
+
+
+def array_path(page: Image.Image, layout: tuple, args, cfg: DeskewConfig) -> int:
+    array, _ = deskew_array(ImageProcessor.as_array(page), cfg)
+    array = ImageProcessor.to_rgb_array(array)
+    table_image = ImageProcessor.crop(array, layout)
+
+    grid = regular_grid(ImageProcessor.image_size(table_image), args.rows, args.columns)
+    for row_cells in grid.cells:
+        for cell in row_cells:
+            ImageProcessor.crop(table_image, cell)
+    return ImageProcessor.add_padding(table_image, args.padding).nbytes
+
+
+def measure(path, page, layout, args, cfg) -> tuple[float, int, int]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    allocated = path(page, layout, args, cfg)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, allocated
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf_path")
+    parser.add_argument("--max-pages", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=30)
+    parser.add_argument("--columns", type=int, default=8)
+    parser.add_argument("--padding", type=int, default=50)
+    parser.add_argument("--grayscale", action="store_true")
+    parser.add_argument("--deskew-mode", default="fast")
+    args = parser.parse_args()
+
+    cfg = DeskewConfig(mode=args.deskew_mode)
+    render = RenderConfig(last_page=args.max_pages, grayscale=args.grayscale)
+    results = {"pil": [], "array": []}
+    for page in ImageProcessor.iter_pdf_path_pages(args.pdf_path, render):
+        width, height = page.size
+        layout = (width * 0.1, height * 0.2, width * 0.9, height * 0.8)
+        results["pil"].append(measure(pil_path, page, layout, args, cfg))
+        results["array"].append(measure(array_path, page, layout, args, cfg))
+
+    for name, values in results.items():
+        seconds, peaks, allocated = zip(*values)
+        print(
+            f"{name:<6}: {1000 * statistics.mean(seconds):8.1f} ms/page, "
+            f"numpy peak {max(peaks) / 2**20:8.1f} MB, "
+            f"image copies {statistics.mean(allocated) / 2**20:8.1f} MB/page"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Compares single and multi-resolution rendering on synthetic documents.
+
+Every setting runs extract_tables on the same documents and reports the
+throughput, the cell accuracy, the share of the prose words around every
+table found in the page text, and the median time of the render, detect,
+render_page, cell_ocr and page_ocr stages.
+
+    python -m benchmarks.multi_resolution --settings 200 100:300 72:300
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+from benchmarks.suite import cell_accuracy, timed, word_recall
+from benchmarks.synthetic import SyntheticConfig, generate
+from tables_extraction.engine import EngineConfig, ExtractionEngine
+from tables_extraction.processing import RenderConfig
+from tables_extraction.profiling import ProfilerConfig
+
+
+def parse_setting(setting: str) -> RenderConfig:
+    """"200" renders everything at 200 DPI, "100:300" detects at 100 DPI and
+    renders tables at 300 DPI"""
+    dpi, _, table_dpi = setting.partition(":")
+    return RenderConfig(dpi=int(dpi), table_dpi=int(table_dpi) if table_dpi else None)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", type=Path, default=Path("benchmark_data"))
+    parser.add_argument("--documents", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--rotation", type=float, default=1.5)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--settings", nargs="+", default=["200", "100:300"])
+    args = parser.parse_args()
+
+    documents = []
+    for idx in range(args.documents):
+        pdf_path = args.data / f"multi_resolution_{idx:03d}.pdf"
+        labels = pdf_path.with_suffix(".json")
+        # documents generated before the prose was recorded are replaced
+        if not labels.exists() or "texts" not in json.loads(labels.read_text()):
+            generate(
+                pdf_path,
+                SyntheticConfig(pages=args.pages, rotation=args.rotation, seed=idx),
+            )
+        documents.append(pdf_path)
+
+    engine = ExtractionEngine(
+        EngineConfig(device=args.device, profiler=ProfilerConfig(trace_memory=False))
+    )
+    engine.warmup()
+
+    for setting in args.settings:
+        render = parse_setting(setting)
+        engine.profiler.reset()
+        pages, seconds, correct, total = 0, 0.0, 0, 0
+        words_found, words_total = 0, 0
+        for pdf_path in documents:
+            labels = json.loads(pdf_path.with_suffix(".json").read_text())
+            (table_dfs, texts), elapsed = timed(
+                engine.extract_tables, str(pdf_path), render
+            )
+            pages += len(table_dfs)
+            seconds += elapsed
+            for expected, table, prose, text in zip(
+                labels["tables"], table_dfs, labels["texts"], texts
+            ):
+                page_correct, page_total = cell_accuracy(expected, table)
+                correct += page_correct
+                total += page_total
+                # the page text is only read on pages with a table
+                if expected is not None:
+                    found, expected_words = word_recall(prose, text)
+                    words_found += found
+                    words_total += expected_words
+
+        stages = engine.profiler.summary()
+        print(
+            f"{setting:<8}: {pages / seconds:6.2f} pages/s, "
+            f"cell accuracy {correct / total if total else 0.0:.3f}, "
+            f"text recall {words_found / words_total if words_total else 0.0:.3f}, p50 "
+            + ", ".join(
+                f"{name} {1000 * stages.get(name, {}).get('p50_seconds', 0.0):.1f} ms"
+                for name in (
+                    "render",
+                    "detect",
+                    "render_page",
+                    "cell_ocr",
+                    "page_ocr",
+                )
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
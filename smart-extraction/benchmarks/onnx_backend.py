@@ -0,0 +1,123 @@
+"""Compares latency and agreement of the torch and ONNX Runtime backends.
+
+    python -m benchmarks.onnx_backend report.pdf --threads 4
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from tables_extraction.models import (
+    OnnxConfig,
+    TatrConfig,
+    TatrExtractor,
+    YoloConfig,
+    YoloDetector,
+)
+from tables_extraction.processing import ImageProcessor, RenderConfig, TableGrid
+from tables_extraction.processing.deskewer import deskew_pil
+
+
+def iou(a, b) -> float:
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+    intersection = max(0.0, x1 - x0) * max(0.0, y1 - y0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def table_box(detector: YoloDetector, result):
+    if len(result) == 0:
+        return None
+    return ImageProcessor.cxcywh2xyxy(detector.get_max_area_bbox(result))
+
+
+def structure_agreement(reference: TableGrid, candidate: TableGrid) -> float:
+    """Mean IoU of every reference row and column with its best match"""
+    if reference.empty:
+        return 1.0 if candidate.empty else 0.0
+    scores = [
+        max((iou(box, other) for other in others), default=0)
+        for boxes, others in (
+            (reference.rows, candidate.rows),
+            (reference.columns, candidate.columns),
+        )
+        for box in boxes
+    ]
+    return statistics.mean(scores)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf_path")
+    parser.add_argument("--max-pages", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=0)
+    args = parser.parse_args()
+
+    pages = [
+        deskew_pil(page).convert("RGB")
+        for page in ImageProcessor.iter_pdf_path_pages(
+            args.pdf_path, RenderConfig(last_page=args.max_pages)
+        )
+    ]
+
+    variants = {
+        "torch": dict(backend="torch"),
+        "onnx fp32": dict(
+            backend="onnx", onnx=OnnxConfig(intra_op_threads=args.threads)
+        ),
+        "onnx int8": dict(
+            backend="onnx",
+            onnx=OnnxConfig(quantize=True, intra_op_threads=args.threads),
+        ),
+    }
+
+    reference_boxes, reference_grids, crops = None, None, None
+    for name, options in variants.items():
+        detector = YoloDetector(YoloConfig(device="cpu", **options))
+        extractor = TatrExtractor(TatrConfig(device="cpu", **options))
+        detector.detect(pages[0])
+
+        start = time.perf_counter()
+        results = [detector.detect(page) for page in pages]
+        detect_ms = 1000 * (time.perf_counter() - start) / len(pages)
+        boxes = [table_box(detector, result) for result in results]
+
+        if crops is None:
+            # structure recognition is compared on the same crops
+            crops = [
+                page.crop(box) for page, box in zip(pages, boxes) if box is not None
+            ]
+
+        start = time.perf_counter()
+        grids = [
+            extractor.outputs_to_grid(extractor.extract(crop), crop.size)
+            for crop in crops
+        ]
+        structure_ms = 1000 * (time.perf_counter() - start) / max(len(crops), 1)
+
+        line = f"{name:<10}: detect {detect_ms:8.1f} ms/page, structure {structure_ms:8.1f} ms/table"
+        if reference_boxes is None:
+            reference_boxes, reference_grids = boxes, grids
+        else:
+            detection_iou = np.mean(
+                [
+                    iou(a, b) if a is not None and b is not None else float(a is b)
+                    for a, b in zip(reference_boxes, boxes)
+                ]
+            )
+            structure = np.mean(
+                [
+                    structure_agreement(a, b)
+                    for a, b in zip(reference_grids, grids)
+                ]
+                or [1.0]
+            )
+            line += f", table IoU vs torch {detection_iou:.3f}, structure IoU {structure:.3f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
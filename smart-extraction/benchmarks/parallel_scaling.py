@@ -0,0 +1,44 @@
+"""Measures extract_tables throughput for different process pool sizes.
+
+    python -m benchmarks.parallel_scaling report.pdf --workers 1 2 4 8
+"""
+
+import argparse
+import time
+
+from tables_extraction.parallel import ParallelConfig, ParallelExtractor
+from tables_extraction.processing import RenderConfig
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf_path")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--chunk-size", type=int, default=4)
+    parser.add_argument("--max-pages", type=int, default=None)
+    args = parser.parse_args()
+
+    render = RenderConfig(last_page=args.max_pages)
+    baseline = None
+    for workers in args.workers:
+        cfg = ParallelConfig(workers=workers, chunk_size=args.chunk_size)
+        with ParallelExtractor(cfg) as extractor:
+            # warm every worker so that model loading is not measured
+            extractor.extract_tables(
+                args.pdf_path, RenderConfig(last_page=workers * args.chunk_size)
+            )
+
+            start = time.perf_counter()
+            table_dfs, _ = extractor.extract_tables(args.pdf_path, render)
+            elapsed = time.perf_counter() - start
+
+        pages_per_second = len(table_dfs) / elapsed
+        baseline = baseline or pages_per_second
+        print(
+            f"workers {workers:<3}: {pages_per_second:7.2f} pages/s, "
+            f"speedup x{pages_per_second / baseline:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
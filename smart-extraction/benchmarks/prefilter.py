@@ -0,0 +1,107 @@
+"""Measures recall and time saved by the no-table page prefilter.
+
+Pages are labeled by a JSON file next to every PDF with the same stem and a
+"tables" list holding null for pages without a table, as written by
+benchmarks.synthetic. Synthetic documents are generated when --data has
+no PDFs. Time saved is the deskew (and, with --detect, detection) time of
+the skipped pages minus the prefilter time of all pages.
+
+    python -m benchmarks.prefilter --data labeled/ --detect
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+from benchmarks.suite import timed
+from benchmarks.synthetic import SyntheticConfig, generate
+from tables_extraction.models import YoloConfig, YoloDetector
+from tables_extraction.processing import (
+    ImageProcessor,
+    PrefilterConfig,
+    RenderConfig,
+    TablePrefilter,
+)
+from tables_extraction.processing.deskewer import DeskewConfig, deskew_array
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", type=Path, default=Path("benchmark_data/prefilter"))
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--table-share", type=float, default=0.3)
+    parser.add_argument("--rotation", type=float, default=1.5)
+    parser.add_argument("--detect", action="store_true")
+    parser.add_argument("--min-lines", type=int, default=PrefilterConfig.min_lines)
+    parser.add_argument("--min-rows", type=int, default=PrefilterConfig.min_rows)
+    args = parser.parse_args()
+
+    documents = sorted(args.data.glob("*.pdf"))
+    if not documents:
+        for idx in range(args.documents):
+            pdf_path = args.data / f"prefilter_{idx:03d}.pdf"
+            generate(
+                pdf_path,
+                SyntheticConfig(
+                    pages=args.pages,
+                    table_share=args.table_share,
+                    rotation=args.rotation,
+                    noise=8.0,
+                    seed=idx,
+                ),
+            )
+            documents.append(pdf_path)
+
+    prefilter = TablePrefilter(
+        PrefilterConfig(enabled=True, min_lines=args.min_lines, min_rows=args.min_rows)
+    )
+    detector = YoloDetector(YoloConfig(device="cpu")) if args.detect else None
+    deskew_cfg = DeskewConfig()
+
+    counts = {"tp": 0, "fn": 0, "tn": 0, "fp": 0}
+    prefilter_seconds, saved_seconds, total_seconds = 0.0, 0.0, 0.0
+    missed = []
+    for pdf_path in documents:
+        labels = json.loads(pdf_path.with_suffix(".json").read_text())["tables"]
+        pages = ImageProcessor.iter_pdf_path_pages(str(pdf_path), RenderConfig())
+        for number, (page, label) in enumerate(zip(pages, labels), start=1):
+            array = ImageProcessor.as_array(page)
+            result, seconds = timed(prefilter.check, array)
+            prefilter_seconds += seconds
+
+            (deskewed, _), skippable = timed(deskew_array, array, deskew_cfg)
+            if detector is not None:
+                _, seconds = timed(
+                    detector.detect, ImageProcessor.to_rgb_array(deskewed)
+                )
+                skippable += seconds
+            total_seconds += skippable
+
+            has_table = label is not None
+            if result.might_have_table:
+                counts["tp" if has_table else "fp"] += 1
+            else:
+                counts["fn" if has_table else "tn"] += 1
+                saved_seconds += skippable
+                if has_table:
+                    missed.append(f"{pdf_path.name}:{number} {result}")
+
+    pages = sum(counts.values())
+    positives = counts["tp"] + counts["fn"]
+    negatives = counts["tn"] + counts["fp"]
+    print(f"pages            : {pages} ({positives} with tables)")
+    print(f"recall           : {counts['tp'] / positives if positives else 1.0:.3f}")
+    print(f"skipped no-table : {counts['tn'] / negatives if negatives else 0.0:.3f}")
+    print(f"prefilter        : {1000 * prefilter_seconds / pages:.1f} ms/page")
+    stages = "deskew + detect" if detector is not None else "deskew"
+    print(
+        f"time saved       : {saved_seconds - prefilter_seconds:.2f} s of "
+        f"{total_seconds:.2f} s {stages}"
+    )
+    for page in missed:
+        print(f"missed table     : {page}")
+
+
+if __name__ == "__main__":
+    main()
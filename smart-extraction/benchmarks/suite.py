@@ -0,0 +1,256 @@
+"""Offline throughput and accuracy benchmark of the extraction pipeline.
+
+Generates synthetic documents (or reuses ones from --data), runs
+extract_tables end to end and every stage on its own, and writes a JSON
+report. Pass an earlier report as --baseline to print the differences.
+
+    python -m benchmarks.suite --output report.json --baseline previous.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import time
+from collections import Counter
+from dataclasses import asdict
+from importlib import metadata
+from pathlib import Path
+
+from benchmarks.synthetic import SyntheticConfig, generate
+from tables_extraction.cache import VERSIONED_PACKAGES
+from tables_extraction.engine import EngineConfig, ExtractionEngine, batched
+from tables_extraction.processing import ImageProcessor, Ocr
+from tables_extraction.profiling import ProfilerConfig, max_rss_bytes, percentile
+
+
+def normalize(text) -> str:
+    return " ".join(str(text).split()).lower()
+
+
+def cell_accuracy(expected: list[list[str]] | None, table) -> tuple[int, int]:
+    """Returns (matching cells, expected cells) of one page"""
+    if expected is None:
+        return 0, 0
+    total = sum(len(row) for row in expected)
+    if table is None:
+        return 0, total
+
+    rows = table.values.tolist()
+    correct = 0
+    for i, row in enumerate(expected):
+        for j, cell in enumerate(row):
+            if i < len(rows) and j < len(rows[i]):
+                correct += normalize(rows[i][j]) == normalize(cell)
+    return correct, total
+
+
+def word_recall(expected: str | None, text: str | None) -> tuple[int, int]:
+    """Returns (found words, expected words) of the prose of one page, each
+    word of the extracted text matching at most one expected word"""
+    if not expected:
+        return 0, 0
+    expected_words = Counter(normalize(word) for word in expected.split())
+    found = Counter(normalize(word) for word in (text or "").split())
+    return sum((expected_words & found).values()), sum(expected_words.values())
+
+
+def latency(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "mean": statistics.mean(values) if values else 0.0,
+        "p50": percentile(values, 0.5),
+        "p90": percentile(values, 0.9),
+        "p99": percentile(values, 0.99),
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def run_end_to_end(engine: ExtractionEngine, documents: list[Path]) -> dict:
+    engine.profiler.reset()
+    pages, seconds, correct, total = 0, 0.0, 0, 0
+    tables_found, tables_expected = 0, 0
+    for pdf_path in documents:
+        truth = json.loads(pdf_path.with_suffix(".json").read_text())["tables"]
+        (table_dfs, _), elapsed = timed(engine.extract_tables, str(pdf_path))
+        pages += len(table_dfs)
+        seconds += elapsed
+
+        for expected, table in zip(truth, table_dfs):
+            page_correct, page_total = cell_accuracy(expected, table)
+            correct += page_correct
+            total += page_total
+            tables_expected += expected is not None
+            tables_found += expected is not None and table is not None
+
+    return {
+        "pages": pages,
+        "seconds": seconds,
+        "pages_per_second": pages / seconds if seconds else 0.0,
+        "cell_accuracy": correct / total if total else 0.0,
+        "table_recall": tables_found / tables_expected if tables_expected else 0.0,
+        "stages": engine.profiler.summary(),
+    }
+
+
+def run_stages(engine: ExtractionEngine, documents: list[Path]) -> dict:
+    """Times every stage in isolation on the same pages"""
+    stages = {
+        name: []
+        for name in ("render", "deskew", "detect", "structure", "cell_ocr", "page_ocr")
+    }
+
+    for pdf_path in documents:
+        pages = []
+        iterator = ImageProcessor.iter_pdf_path_pages(str(pdf_path))
+        while True:
+            start = time.perf_counter()
+            page = next(iterator, None)
+            if page is None:
+                break
+            stages["render"].append(time.perf_counter() - start)
+            pages.append(page)
+
+        prepared = []
+        for page in pages:
+            (page, *_), elapsed = timed(engine.prepare_page, page)
+            stages["deskew"].append(elapsed)
+            prepared.append(page)
+
+        tables = []
+        for window in batched(prepared, engine.detector.cfg.batch_size):
+            detections, elapsed = timed(engine.detector.detect_batch, window)
+            stages["detect"].extend([elapsed / len(window)] * len(window))
+            for page, detection_result in zip(window, detections):
+                table = engine.crop_table(page, detection_result)
+                if table is not None:
+                    tables.append((page, *table))
+
+        for page, table_image, layout in tables:
+            outputs, elapsed = timed(engine.extractor.extract, table_image)
+            stages["structure"].append(elapsed)
+            grid = engine.extractor.outputs_to_grid(
+                outputs, ImageProcessor.image_size(table_image)
+            )
+            if grid.empty:
+                continue
+
+            rows, elapsed = timed(engine.ocr.run_on_table, table_image, grid)
+            stages["cell_ocr"].append(elapsed)
+            data = Ocr.merge_data(rows)
+            _, elapsed = timed(engine.ocr.run_page_text, page, layout, data)
+            stages["page_ocr"].append(elapsed)
+
+    return {name: latency(values) for name, values in stages.items()}
+
+
+def environment() -> dict:
+    versions = {}
+    for package in VERSIONED_PACKAGES + ("numpy", "pillow"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "packages": versions,
+    }
+
+
+def compare(report: dict, baseline: dict):
+    def change(new, old):
+        if not old:
+            return f"{new:10.3f}"
+        return f"{new:10.3f} (was {old:10.3f}, {100 * (new - old) / old:+6.1f}%)"
+
+    new, old = report["end_to_end"], baseline["end_to_end"]
+    for key in ("pages_per_second", "cell_accuracy", "table_recall"):
+        print(f"{key:<20}: {change(new[key], old[key])}")
+    print(
+        f"{'peak_rss_mb':<20}: "
+        f"{change(report['peak_rss_bytes'] / 2**20, baseline['peak_rss_bytes'] / 2**20)}"
+    )
+    for stage, stats in report["stages"].items():
+        if stage in baseline["stages"]:
+            print(
+                f"{stage + ' p50 ms':<20}: "
+                f"{change(1000 * stats['p50'], 1000 * baseline['stages'][stage]['p50'])}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", type=Path, default=Path("benchmark_data"))
+    parser.add_argument("--documents", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--rotation", type=float, default=1.5)
+    parser.add_argument("--noise", type=float, default=8.0)
+    parser.add_argument("--scan-artifacts", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--output", type=Path, default=Path("benchmark_report.json"))
+    parser.add_argument("--baseline", type=Path, default=None)
+    args = parser.parse_args()
+
+    configs = [
+        SyntheticConfig(
+            pages=args.pages,
+            rotation=args.rotation,
+            noise=args.noise,
+            scan_artifacts=args.scan_artifacts,
+            seed=args.seed + idx,
+        )
+        for idx in range(args.documents)
+    ]
+    documents = []
+    for idx, cfg in enumerate(configs):
+        pdf_path = args.data / f"synthetic_{idx:03d}.pdf"
+        # regenerate when missing or produced with other settings
+        truth_path = pdf_path.with_suffix(".json")
+        if not truth_path.exists() or json.loads(truth_path.read_text())[
+            "config"
+        ] != asdict(cfg):
+            generate(pdf_path, cfg)
+        documents.append(pdf_path)
+
+    engine = ExtractionEngine(
+        EngineConfig(device=args.device, profiler=ProfilerConfig(trace_memory=False))
+    )
+    engine.warmup()
+
+    report = {
+        "environment": environment(),
+        "documents": [asdict(cfg) for cfg in configs],
+        "engine": repr(engine.cfg),
+        "end_to_end": run_end_to_end(engine, documents),
+        "stages": run_stages(engine, documents),
+        "peak_rss_bytes": max_rss_bytes(),
+        "warmup": engine.metrics.as_dict(),
+    }
+    args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+    end_to_end = report["end_to_end"]
+    print(f"pages/s       : {end_to_end['pages_per_second']:.3f}")
+    print(f"cell accuracy : {end_to_end['cell_accuracy']:.3f}")
+    print(f"table recall  : {end_to_end['table_recall']:.3f}")
+    print(f"peak RSS, MB  : {report['peak_rss_bytes'] / 2**20:.0f}")
+    for stage, stats in report["stages"].items():
+        print(
+            f"{stage:<10} p50 {1000 * stats['p50']:8.1f} ms, "
+            f"p90 {1000 * stats['p90']:8.1f} ms, p99 {1000 * stats['p99']:8.1f} ms"
+        )
+
+    if args.baseline is not None:
+        print(f"\ncompared to {args.baseline}:")
+        compare(report, json.loads(args.baseline.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Generates scanned-looking financial table PDFs with known cell contents.
+
+    python -m benchmarks.synthetic out/ --documents 4 --pages 10 --rotation 2
+"""
+
+import argparse
+import json
+import random
+from dataclasses import dataclass, asdict
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+A4_INCHES = (8.27, 11.69)
+
+LABELS = [
+    "Revenue",
+    "Cost of sales",
+    "Gross profit",
+    "Selling expenses",
+    "Administrative expenses",
+    "Operating profit",
+    "Interest income",
+    "Interest expense",
+    "Profit before tax",
+    "Income tax",
+    "Net profit",
+    "Total assets",
+    "Total liabilities",
+    "Equity",
+    "Cash",
+    "Inventories",
+]
+
+
+@dataclass
+class SyntheticConfig:
+    pages: int = 10
+    # share of pages that carry a table, the rest is prose
+    table_share: float = 0.5
+    rows: int = 12
+    columns: int = 5
+    dpi: int = 200
+    # pages are rotated by a random angle in [-rotation, rotation] degrees
+    rotation: float = 0.0
+    # standard deviation of gaussian pixel noise
+    noise: float = 0.0
+    # blur, speckles and jpeg compression of a cheap scanner
+    scan_artifacts: bool = False
+    seed: int = 0
+
+
+def number(rng: random.Random) -> str:
+    value = rng.randint(-500_000, 5_000_000) / 100
+    return f"{value:,.2f}".replace(",", " ")
+
+
+def make_table(cfg: SyntheticConfig, rng: random.Random) -> list[list[str]]:
+    header = ["Indicator"] + [f"{2015 + i}" for i in range(cfg.columns - 1)]
+    rows = [header]
+    for idx in range(cfg.rows):
+        label = LABELS[idx % len(LABELS)]
+        rows.append([label] + [number(rng) for _ in range(cfg.columns - 1)])
+    return rows
+
+
+def draw_prose(
+    draw: ImageDraw.ImageDraw, font, top: int, bottom: int, width: int, rng
+) -> list[str]:
+    """Draws lines of prose and returns them"""
+    line_height = int(font.size * 1.6)
+    margin = width // 10
+    words = "the company reported stable results for the period under review".split()
+    lines = []
+    for y in range(top, bottom - line_height, line_height):
+        line = " ".join(rng.choice(words) for _ in range(rng.randint(6, 11)))
+        draw.text((margin, y), line, fill=0, font=font)
+        lines.append(line)
+    return lines
+
+
+def draw_table(draw: ImageDraw.ImageDraw, font, rows: list[list[str]], top, width):
+    margin = width // 10
+    table_width = width - 2 * margin
+    first_column = int(table_width * 0.35)
+    other_column = (table_width - first_column) // (len(rows[0]) - 1)
+    row_height = int(font.size * 2)
+
+    xs = [margin, margin + first_column]
+    xs += [xs[-1] + other_column * (i + 1) for i in range(len(rows[0]) - 1)]
+    bottom = top + row_height * len(rows)
+
+    for x in xs:
+        draw.line([(x, top), (x, bottom)], fill=0, width=2)
+    for i in range(len(rows) + 1):
+        y = top + i * row_height
+        draw.line([(xs[0], y), (xs[-1], y)], fill=0, width=2)
+
+    for i, row in enumerate(rows):
+        y = top + i * row_height + (row_height - font.size) // 2
+        for j, cell in enumerate(row):
+            draw.text((xs[j] + 8, y), cell, fill=0, font=font)
+
+    return bottom
+
+
+def degrade(page: Image.Image, cfg: SyntheticConfig, rng: random.Random) -> Image.Image:
+    if cfg.rotation:
+        angle = rng.uniform(-cfg.rotation, cfg.rotation)
+        page = page.rotate(angle, expand=False, fillcolor=255, resample=Image.BICUBIC)
+
+    if cfg.scan_artifacts:
+        page = page.filter(ImageFilter.GaussianBlur(radius=0.8))
+
+    if cfg.noise or cfg.scan_artifacts:
+        array = np.asarray(page, dtype=np.float32)
+        np_rng = np.random.default_rng(rng.randint(0, 2**32 - 1))
+        if cfg.noise:
+            array = array + np_rng.normal(0, cfg.noise, array.shape)
+        if cfg.scan_artifacts:
+            speckles = np_rng.random(array.shape) < 0.001
+            array[speckles] = 0
+        page = Image.fromarray(np.clip(array, 0, 255).astype(np.uint8))
+
+    if cfg.scan_artifacts:
+        buffer = BytesIO()
+        page.save(buffer, format="JPEG", quality=60)
+        page = Image.open(BytesIO(buffer.getvalue())).convert("L")
+
+    return page
+
+
+def generate(pdf_path: Path, cfg: SyntheticConfig) -> list[list[list[str]] | None]:
+    """Writes the PDF and returns the expected table of every page; the JSON
+    next to it also holds the prose drawn on every page"""
+    rng = random.Random(cfg.seed)
+    width, height = (int(side * cfg.dpi) for side in A4_INCHES)
+    font = ImageFont.load_default(size=max(12, cfg.dpi // 9))
+
+    pages, truth, texts = [], [], []
+    for _ in range(cfg.pages):
+        page = Image.new("L", (width, height), color=255)
+        draw = ImageDraw.Draw(page)
+
+        if rng.random() < cfg.table_share:
+            rows = make_table(cfg, rng)
+            prose = draw_prose(draw, font, height // 12, height // 4, width, rng)
+            bottom = draw_table(draw, font, rows, height // 4, width)
+            prose += draw_prose(
+                draw, font, bottom + font.size * 2, height * 11 // 12, width, rng
+            )
+            truth.append(rows)
+        else:
+            prose = draw_prose(draw, font, height // 12, height * 11 // 12, width, rng)
+            truth.append(None)
+        texts.append("\n".join(prose))
+
+        pages.append(degrade(page, cfg, rng).convert("RGB"))
+
+    pdf_path.parent.mkdir(parents=True, exist_ok=True)
+    pages[0].save(
+        pdf_path, save_all=True, append_images=pages[1:], resolution=cfg.dpi
+    )
+    pdf_path.with_suffix(".json").write_text(
+        json.dumps(
+            {"config": asdict(cfg), "tables": truth, "texts": texts},
+            ensure_ascii=False,
+        )
+    )
+    return truth
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=SyntheticConfig.pages)
+    parser.add_argument("--rotation", type=float, default=0.0)
+    parser.add_argument("--noise", type=float, default=0.0)
+    parser.add_argument("--scan-artifacts", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for idx in range(args.documents):
+        cfg = SyntheticConfig(
+            pages=args.pages,
+            rotation=args.rotation,
+            noise=args.noise,
+            scan_artifacts=args.scan_artifacts,
+            seed=args.seed + idx,
+        )
+        generate(args.output_dir / f"synthetic_{idx:03d}.pdf", cfg)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Compares one-page and batched YOLO table detection throughput.
+
+    python -m benchmarks.yolo_batch report.pdf --batch-sizes 1 4 8 16
+"""
+
+import argparse
+import time
+
+from tables_extraction.engine import default_device
+from tables_extraction.models import YoloDetector, YoloConfig
+from tables_extraction.processing import ImageProcessor, RenderConfig
+from tables_extraction.processing.deskewer import deskew_pil
+
+
+def run_single(detector: YoloDetector, pages) -> float:
+    start = time.perf_counter()
+    for page in pages:
+        detector.detect(page)
+    return time.perf_counter() - start
+
+
+def run_batched(detector: YoloDetector, pages, batch_size: int) -> float:
+    start = time.perf_counter()
+    detector.detect_batch(pages, batch_size=batch_size)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf_path")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[2, 4, 8, 16])
+    parser.add_argument("--max-pages", type=int, default=32)
+    parser.add_argument("--device", default=default_device())
+    args = parser.parse_args()
+
+    pages = [
+        deskew_pil(page).convert("RGB")
+        for page in ImageProcessor.iter_pdf_path_pages(
+            args.pdf_path, RenderConfig(last_page=args.max_pages)
+        )
+    ]
+    detector = YoloDetector(YoloConfig(device=args.device))
+    # first call compiles kernels and allocates buffers
+    detector.detect(pages[0])
+
+    elapsed = run_single(detector, pages)
+    print(f"single     : {len(pages) / elapsed:7.2f} pages/s")
+    for batch_size in args.batch_sizes:
+        elapsed = run_batched(detector, pages, batch_size)
+        print(f"batch {batch_size:<5}: {len(pages) / elapsed:7.2f} pages/s")
+
+
+if __name__ == "__main__":
+    main()
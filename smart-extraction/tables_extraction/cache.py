@@ -0,0 +1,194 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from importlib import metadata
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+
+# bump when the pipeline changes in a way that invalidates stored pages
+CACHE_VERSION = 1
+
+VERSIONED_PACKAGES = ("torch", "transformers", "ultralytics", "easyocr", "pdf2image")
+
+
+def default_cache_path() -> Path:
+    return Path(
+        os.environ.get("TABLES_CACHE_DIR", Path.home() / ".cache" / "tables_extraction")
+    )
+
+
+@dataclass
+class CacheConfig:
+    path: Path = field(default_factory=default_cache_path)
+    max_size_bytes: int = 1024**3
+    # eviction frees space down to this share of max_size_bytes
+    evict_to: float = 0.9
+
+
+@dataclass
+class CachedPage:
+    table: pd.DataFrame | None
+    text: str | None
+
+
+class ExtractionCache:
+    """Stores extracted tables and page texts keyed by document content hash,
+    page number and extraction config, evicting least recently used pages."""
+
+    def __init__(self, cfg: CacheConfig | None = None):
+        self.cfg = cfg or CacheConfig()
+        self.cfg.path.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            self.cfg.path / "index.sqlite3", check_same_thread=False
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT PRIMARY KEY,
+                doc_hash TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                config_key TEXT NOT NULL,
+                table_json TEXT,
+                text TEXT,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            )
+            """
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed)"
+        )
+        # running total of pages.size, kept in the database so that every
+        # process sharing the cache sees the same value
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS totals (size INTEGER NOT NULL)"
+        )
+        if self.connection.execute("SELECT COUNT(*) FROM totals").fetchone()[0] == 0:
+            self.connection.execute(
+                "INSERT INTO totals SELECT COALESCE(SUM(size), 0) FROM pages"
+            )
+        self.connection.commit()
+
+    @staticmethod
+    def file_hash(path: str, chunk_size: int = 1024 * 1024) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def config_key(*configs) -> str:
+        versions = []
+        for package in VERSIONED_PACKAGES:
+            try:
+                versions.append(f"{package}={metadata.version(package)}")
+            except metadata.PackageNotFoundError:
+                versions.append(f"{package}=none")
+
+        description = "|".join(
+            [str(CACHE_VERSION), *versions, *(repr(cfg) for cfg in configs)]
+        )
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    @staticmethod
+    def page_key(doc_hash: str, page: int, config_key: str) -> str:
+        return hashlib.sha256(f"{doc_hash}:{page}:{config_key}".encode()).hexdigest()
+
+    def get(self, doc_hash: str, page: int, config_key: str) -> CachedPage | None:
+        key = self.page_key(doc_hash, page, config_key)
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT table_json, text FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE pages SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+            self.connection.commit()
+
+        table_json, text = row
+        table = None
+        if table_json is not None:
+            table = pd.read_json(StringIO(table_json), orient="split", dtype=False)
+        return CachedPage(table=table, text=text)
+
+    def put(
+        self,
+        doc_hash: str,
+        page: int,
+        config_key: str,
+        table: pd.DataFrame | None,
+        text: str | None,
+    ):
+        table_json = None if table is None else table.to_json(orient="split")
+        # stored as UTF-8, Cyrillic takes two bytes per character
+        size = len((table_json or "").encode()) + len((text or "").encode())
+        key = self.page_key(doc_hash, page, config_key)
+
+        # committed on success, rolled back if anything raises
+        with self._lock, self.connection:
+            # the write lock is taken before the old size is read
+            self.connection.execute("BEGIN IMMEDIATE")
+            row = self.connection.execute(
+                "SELECT size FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    doc_hash,
+                    page,
+                    config_key,
+                    table_json,
+                    text,
+                    size,
+                    time.time(),
+                ),
+            )
+            self.connection.execute(
+                "UPDATE totals SET size = size + ?", (size - (row[0] if row else 0),)
+            )
+            self._evict()
+
+    def size(self) -> int:
+        with self._lock:
+            return self._size()
+
+    def _size(self) -> int:
+        return self.connection.execute("SELECT size FROM totals").fetchone()[0]
+
+    def _evict(self):
+        total = self._size()
+        if total <= self.cfg.max_size_bytes:
+            return
+
+        target = self.cfg.max_size_bytes * self.cfg.evict_to
+        evicted = []
+        for key, size in self.connection.execute(
+            "SELECT key, size FROM pages ORDER BY accessed"
+        ):
+            if total <= target:
+                break
+            evicted.append((key,))
+            total -= size
+
+        self.connection.executemany("DELETE FROM pages WHERE key = ?", evicted)
+        self.connection.execute("UPDATE totals SET size = ?", (total,))
+
+    def clear(self):
+        with self._lock:
+            self.connection.execute("DELETE FROM pages")
+            self.connection.execute("UPDATE totals SET size = 0")
+            self.connection.commit()
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,665 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass, field, replace
+from itertools import groupby, islice
+from typing import AsyncIterator, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+import torch
+from PIL import Image
+
+from tables_extraction.cache import CacheConfig, ExtractionCache
+from tables_extraction.models import YoloDetector, YoloConfig, TatrExtractor, TatrConfig
+from tables_extraction.profiling import Profiler, ProfilerConfig
+from tables_extraction.processing import (
+    ImageProcessor as Processor,
+    RenderConfig,
+    TableGrid,
+    Ocr,
+    OcrConfig,
+    PageWords,
+    PrefilterConfig,
+    TablePrefilter,
+    TextLayer,
+    TextLayerConfig,
+)
+from tables_extraction.processing.deskewer import (
+    DeskewConfig,
+    deskew_array,
+    rotate,
+)
+
+# rendered pages come in as PIL images and are passed on as uint8 arrays
+PageImage = Image.Image | np.ndarray
+
+
+def default_device() -> str:
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+class FailedPage(tuple):
+    """(None, None) result of a page whose extraction raised, never cached.
+
+    Told apart from an empty page by its type rather than its identity, so it
+    survives copies, pickling and process boundaries"""
+
+
+FAILED = FailedPage((None, None))
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while window := list(islice(iterator, size)):
+        yield window
+
+
+def contiguous_runs(numbers: list[int]) -> Iterator[tuple[int, int]]:
+    """Groups sorted numbers into inclusive (first, last) runs"""
+    for _, group in groupby(enumerate(numbers), key=lambda item: item[1] - item[0]):
+        group = [number for _, number in group]
+        yield group[0], group[-1]
+
+
+@dataclass
+class EngineConfig:
+    device: str = field(default_factory=default_device)
+    yolo: YoloConfig | None = None
+    tatr: TatrConfig | None = None
+    ocr: OcrConfig = field(default_factory=OcrConfig)
+    render: RenderConfig = field(default_factory=RenderConfig)
+    deskew: DeskewConfig = field(default_factory=DeskewConfig)
+    text_layer: TextLayerConfig = field(default_factory=TextLayerConfig)
+    prefilter: PrefilterConfig = field(default_factory=PrefilterConfig)
+    profiler: ProfilerConfig = field(default_factory=ProfilerConfig)
+    # pages are cached on disk only when set
+    cache: CacheConfig | None = None
+    # results aiter_pages keeps ahead of its consumer before extraction waits
+    async_buffer: int = 2
+
+    def yolo_config(self) -> YoloConfig:
+        return self.yolo or YoloConfig(device=self.device)
+
+    def tatr_config(self) -> TatrConfig:
+        return self.tatr or TatrConfig(device=self.device)
+
+
+@dataclass
+class EngineMetrics:
+    load_seconds: dict[str, float] = field(default_factory=dict)
+    warmup_seconds: float = 0.0
+    calls: int = 0
+    pages: int = 0
+    tables: int = 0
+    cache_hits: int = 0
+    text_layer_pages: int = 0
+    prefiltered_pages: int = 0
+    last_call_seconds: float = 0.0
+    total_call_seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "load_seconds": dict(self.load_seconds),
+            "warmup_seconds": self.warmup_seconds,
+            "calls": self.calls,
+            "pages": self.pages,
+            "tables": self.tables,
+            "cache_hits": self.cache_hits,
+            "text_layer_pages": self.text_layer_pages,
+            "prefiltered_pages": self.prefiltered_pages,
+            "last_call_seconds": self.last_call_seconds,
+            "total_call_seconds": self.total_call_seconds,
+            "mean_call_seconds": (
+                self.total_call_seconds / self.calls if self.calls else 0.0
+            ),
+        }
+
+
+@dataclass
+class PageResult:
+    # 1-based, as in RenderConfig
+    page: int
+    table: pd.DataFrame | None
+    text: str | None
+    # time since the page's detection window started, or of the cache lookup
+    seconds: float
+    # time since the document started
+    since_start: float
+    # extraction raised, table and text are None
+    failed: bool = False
+
+
+class ExtractionEngine:
+    """Keeps the detection, structure and OCR models loaded between calls."""
+
+    def __init__(self, cfg: EngineConfig | None = None):
+        self.cfg = cfg or EngineConfig()
+        self.metrics = EngineMetrics()
+        self.profiler = Profiler(self.cfg.profiler)
+        self.text_layer = TextLayer(self.cfg.text_layer)
+        self.prefilter = TablePrefilter(self.cfg.prefilter)
+        self.cache = ExtractionCache(self.cfg.cache) if self.cfg.cache else None
+
+        self._detector: YoloDetector | None = None
+        self._extractor: TatrExtractor | None = None
+        self._ocr: Ocr | None = None
+
+        # models are loaded once, inference calls are serialized
+        self._load_lock = threading.Lock()
+        self._call_lock = threading.RLock()
+
+    def _load(self, name: str, factory):
+        with self._load_lock:
+            model = getattr(self, f"_{name}")
+            if model is None:
+                start = time.perf_counter()
+                model = factory()
+                self.metrics.load_seconds[name] = time.perf_counter() - start
+                setattr(self, f"_{name}", model)
+            return model
+
+    @property
+    def detector(self) -> YoloDetector:
+        if self._detector is None:
+            return self._load("detector", lambda: YoloDetector(self.cfg.yolo_config()))
+        return self._detector
+
+    @property
+    def extractor(self) -> TatrExtractor:
+        if self._extractor is None:
+            return self._load(
+                "extractor", lambda: TatrExtractor(self.cfg.tatr_config())
+            )
+        return self._extractor
+
+    @property
+    def ocr(self) -> Ocr:
+        if self._ocr is None:
+            return self._load("ocr", lambda: Ocr(self.cfg.ocr))
+        return self._ocr
+
+    @property
+    def loaded(self) -> bool:
+        return all(
+            model is not None for model in (self._detector, self._extractor, self._ocr)
+        )
+
+    def warmup(self, run_inference: bool = True) -> EngineMetrics:
+        """Loads all models and optionally runs them once on a blank page."""
+        detector, extractor, ocr = self.detector, self.extractor, self.ocr
+
+        if run_inference:
+            start = time.perf_counter()
+            with self._call_lock:
+                blank = Image.new("RGB", (640, 640), color=(255, 255, 255))
+                detector.detect(blank)
+                extractor.extract(blank)
+                ocr.run_on_whole_page(blank)
+            self.metrics.warmup_seconds = time.perf_counter() - start
+
+        return self.metrics
+
+    def might_have_table(self, page: PageImage, number: int | None = None) -> bool:
+        """Runs the prefilter on the page as rendered, before deskew"""
+        if not self.cfg.prefilter.enabled:
+            return True
+        with self.profiler.stage("prefilter", number) as record:
+            result = self.prefilter.might_have_table(Processor.as_array(page))
+            record.counts["skipped"] = int(not result)
+        self.metrics.prefiltered_pages += not result
+        return result
+
+    def prepare_page(
+        self, page: PageImage, words: PageWords | None = None, number: int | None = None
+    ) -> tuple[np.ndarray, PageWords | None, float]:
+        """Deskews scanned pages; pages with a text layer are born-digital and
+        keep their geometry so that the words can be mapped onto them.
+
+        Returns an HxWx3 uint8 array that shares memory with the rendered
+        page unless it had to be rotated, the words and the applied angle"""
+        page, angle = Processor.as_array(page), 0.0
+        if self.text_layer.usable(words):
+            words = words.scaled(Processor.image_size(page))
+        else:
+            with self.profiler.stage("deskew", number):
+                (page, angle), words = deskew_array(page, self.cfg.deskew), None
+
+        return Processor.to_rgb_array(page), words, angle
+
+    def crop_table(
+        self, page: np.ndarray, detection_result
+    ) -> tuple[np.ndarray, tuple] | None:
+        """The table crop is a view of the page, clipped to its bounds"""
+        if len(detection_result) == 0:
+            return None
+        bbox = self.detector.get_max_area_bbox(detection_result)
+
+        layout = Processor.cxcywh2xyxy(bbox)
+        layout = Processor.xyxy_add_margin(layout, margin=[20, -5, 20, 20])
+        layout = Processor.clip_box(layout, Processor.image_size(page))
+        return Processor.crop(page, layout), layout
+
+    def render_page(
+        self,
+        pdf_path: str,
+        number: int,
+        page_size: tuple[int, int],
+        angle: float,
+        layout: tuple,
+        render: RenderConfig,
+    ) -> tuple[np.ndarray, tuple]:
+        """Renders the whole page once at `render.table_dpi`, deskewed by the
+        same angle as the detection page, and returns it with the table layout
+        scaled onto it. Both the table crop and the page text are read from it.
+
+        `layout` is in pixels of the deskewed page and `page_size` is the size
+        of the page as rendered, before deskew."""
+        scale = render.table_scale
+        width, height = page_size
+        page = Processor.to_rgb_array(
+            Processor.render_region(
+                pdf_path,
+                number,
+                (0, 0, width * scale, height * scale),
+                render.table_dpi,
+                render.grayscale,
+            )
+        )
+        if angle != 0:
+            page = rotate(page, angle, 255)
+        return page, Processor.clip_box(
+            [value * scale for value in layout], Processor.image_size(page)
+        )
+
+    def read_table(
+        self,
+        page: np.ndarray,
+        table_image: np.ndarray,
+        layout: tuple,
+        grid: TableGrid,
+        words: PageWords | None = None,
+        number: int | None = None,
+        text_page: tuple[np.ndarray, tuple] | None = None,
+    ) -> tuple[pd.DataFrame | None, str | None]:
+        """`text_page` is the page and table layout the page text is read
+        from, the detection page by default"""
+        if grid.empty:
+            return None, None
+
+        if words is not None:
+            self.metrics.text_layer_pages += 1
+            with self.profiler.stage(
+                "text_layer_cells", number, cells=grid.cell_count
+            ):
+                # headings and body text around the table would be clamped
+                # into its edge cells
+                table_words = words.within(
+                    layout, self.cfg.text_layer.min_overlap
+                ).shifted(layout[0], layout[1])
+                outputs = Ocr.assign_to_cells(table_words.as_ocr_results(), grid)
+                data = self.ocr.merge_data(outputs)
+            return pd.DataFrame(data), words.text()
+
+        with self.profiler.stage("cell_ocr", number, tables=1, cells=grid.cell_count):
+            outputs = self.ocr.run_on_table(table_image, grid)
+            data = self.ocr.merge_data(outputs)
+
+        text_image, text_layout = text_page or (page, layout)
+        with self.profiler.stage("page_ocr", number):
+            text = self.ocr.run_page_text(text_image, text_layout, data)
+
+        return pd.DataFrame(data), text
+
+    def extract_page(
+        self, page: PageImage, words: PageWords | None = None
+    ) -> tuple[pd.DataFrame | None, str | None]:
+        if not self.might_have_table(page):
+            return None, None
+        page, words, _ = self.prepare_page(page, words)
+        table = self.crop_table(page, self.detector.detect(page))
+        if table is None:
+            return None, None
+        table_image, layout = table
+
+        grid = self.extractor.outputs_to_grid(
+            self.extractor.extract(table_image), Processor.image_size(table_image)
+        )
+        return self.read_table(page, table_image, layout, grid, words)
+
+    def iter_window(
+        self,
+        pages: list[PageImage],
+        page_words: list[PageWords | None] | None = None,
+        page_numbers: list[int] | None = None,
+        pdf_path: str | None = None,
+        render: RenderConfig | None = None,
+    ) -> Iterator[tuple[int, tuple[pd.DataFrame | None, str | None]]]:
+        """Runs detection and structure recognition in batches, OCR page by page,
+        and yields (index in window, result) as soon as each page is done.
+
+        With the document and a multi-resolution `render`, scanned pages with
+        a table are rendered once more at `render.table_dpi`; the table is
+        cropped from that render for structure recognition and cell OCR, and
+        the text around it is read from the same render"""
+        page_words = page_words or [None] * len(pages)
+        page_numbers = page_numbers or [None] * len(pages)
+        if pdf_path is None or render is None or render.table_dpi is None:
+            render = None
+
+        pending = set(range(len(pages)))
+        for idx, result in self._iter_window(
+            pages, page_words, page_numbers, pdf_path, render
+        ):
+            pending.discard(idx)
+            yield idx, result
+
+        for idx in sorted(pending):
+            yield idx, FAILED
+
+    def _iter_window(
+        self,
+        pages: list[PageImage],
+        page_words: list[PageWords | None],
+        page_numbers: list[int | None],
+        pdf_path: str | None,
+        render: RenderConfig | None,
+    ) -> Iterator[tuple[int, tuple[pd.DataFrame | None, str | None]]]:
+        prepared = []
+        for idx, (page, words) in enumerate(zip(pages, page_words)):
+            try:
+                if not self.might_have_table(page, page_numbers[idx]):
+                    yield idx, (None, None)
+                    continue
+                prepared.append(
+                    (idx, *self.prepare_page(page, words, page_numbers[idx]))
+                )
+            except Exception as e:
+                self.profiler.error("prepare", page_numbers[idx], e)
+
+        if len(prepared) == 0:
+            return
+
+        try:
+            with self.profiler.stage("detect", pages=len(prepared)) as record:
+                detections = self.detector.detect_batch(
+                    [page for _, page, *_ in prepared]
+                )
+                record.counts["tables"] = sum(
+                    len(detection_result) > 0 for detection_result in detections
+                )
+        except Exception as e:
+            self.profiler.error("detect", None, e)
+            return
+
+        tables = []
+        for (idx, page, words, angle), detection_result in zip(prepared, detections):
+            try:
+                table = self.crop_table(page, detection_result)
+                text_page = None
+                # text layer pages are not OCRed, their words are already exact
+                if table is not None and render is not None and words is None:
+                    layout = table[1]
+                    with self.profiler.stage("render_page", page_numbers[idx]):
+                        text_page = self.render_page(
+                            pdf_path,
+                            page_numbers[idx],
+                            Processor.image_size(pages[idx]),
+                            angle,
+                            layout,
+                            render,
+                        )
+                    table = (Processor.crop(*text_page), layout)
+            except Exception as e:
+                self.profiler.error("crop", page_numbers[idx], e)
+                continue
+            if table is None:
+                yield idx, (None, None)
+            else:
+                tables.append((idx, page, words, text_page, *table))
+
+        if len(tables) == 0:
+            return
+
+        try:
+            with self.profiler.stage("structure", tables=len(tables)):
+                grids = self.extractor.extract_grids_batch(
+                    [table_image for *_, table_image, _ in tables]
+                )
+        except Exception as e:
+            self.profiler.error("structure", None, e)
+            return
+
+        for (idx, page, words, text_page, table_image, layout), grid in zip(
+            tables, grids
+        ):
+            try:
+                result = self.read_table(
+                    page,
+                    table_image,
+                    layout,
+                    grid,
+                    words,
+                    page_numbers[idx],
+                    text_page,
+                )
+            except Exception as e:
+                self.profiler.error("read_table", page_numbers[idx], e)
+                continue
+            yield idx, result
+
+    def extract_pages(
+        self,
+        pages: list[PageImage],
+        page_words: list[PageWords | None] | None = None,
+        page_numbers: list[int] | None = None,
+    ) -> list[tuple[pd.DataFrame | None, str | None]]:
+        results = [FAILED] * len(pages)
+        for idx, result in self.iter_window(pages, page_words, page_numbers):
+            results[idx] = result
+        return results
+
+    def read_text_layers(
+        self, pdf_path: str, page_numbers: list[int]
+    ) -> list[PageWords | None]:
+        if not self.cfg.text_layer.enabled:
+            return [None] * len(page_numbers)
+        try:
+            with self.profiler.stage("text_layer", pages=len(page_numbers)):
+                return self.text_layer.read_pdf_path(
+                    pdf_path, page_numbers[0], page_numbers[-1]
+                )
+        except Exception as e:
+            self.profiler.error("text_layer", page_numbers[0], e)
+            return [None] * len(page_numbers)
+
+    def cache_key(self, render: RenderConfig) -> str:
+        return ExtractionCache.config_key(
+            self.cfg.yolo_config(),
+            self.cfg.tatr_config(),
+            self.cfg.ocr,
+            self.cfg.deskew,
+            self.cfg.text_layer,
+            self.cfg.prefilter,
+            (render.dpi, render.grayscale, render.table_dpi),
+        )
+
+    def _iter_rendered(
+        self, pdf_path: str, render: RenderConfig
+    ) -> Iterator[tuple[int, tuple, float]]:
+        """Yields (page number, result, seconds since its window started).
+
+        The engine lock is only held while the next page is being computed and
+        is released before every yield, so a slow or abandoned consumer does
+        not block other callers of the engine"""
+        page_numbers = render.page_range(Processor.pdf_path_page_count(pdf_path))
+        pages = self.profiler.iterate(
+            "render",
+            Processor.iter_pdf_path_pages(pdf_path, render),
+            first_page=page_numbers.start,
+        )
+        for numbers, window in zip(
+            batched(page_numbers, self.detector.cfg.batch_size),
+            batched(pages, self.detector.cfg.batch_size),
+        ):
+            start = time.perf_counter()
+            page_words = self.read_text_layers(pdf_path, numbers)
+            with closing(
+                self.iter_window(window, page_words, numbers, pdf_path, render)
+            ) as results:
+                while True:
+                    with self._call_lock:
+                        item = next(results, None)
+                    if item is None:
+                        break
+                    idx, result = item
+                    yield numbers[idx], result, time.perf_counter() - start
+
+    def _iter_cached(
+        self, pdf_path: str, render: RenderConfig
+    ) -> Iterator[tuple[int, tuple, float]]:
+        doc_hash = ExtractionCache.file_hash(pdf_path)
+        config_key = self.cache_key(render)
+        pages = render.page_range(Processor.pdf_path_page_count(pdf_path))
+
+        missing = []
+        for page in pages:
+            start = time.perf_counter()
+            cached = self.cache.get(doc_hash, page, config_key)
+            if cached is None:
+                missing.append(page)
+                continue
+            self.metrics.cache_hits += 1
+            yield page, (cached.table, cached.text), time.perf_counter() - start
+
+        for first, last in contiguous_runs(missing):
+            for page, result, seconds in self._iter_rendered(
+                pdf_path, replace(render, first_page=first, last_page=last)
+            ):
+                # failed pages are retried on the next call
+                if not isinstance(result, FailedPage):
+                    self.cache.put(doc_hash, page, config_key, *result)
+                yield page, result, seconds
+
+    def iter_pages(
+        self, pdf_path: str, render: RenderConfig | None = None
+    ) -> Iterator[PageResult]:
+        """Yields every page as soon as it is extracted. Pages come in page
+        order across windows, and inside a window pages without a table come
+        before the ones that need OCR."""
+        render = render or self.cfg.render
+        start = time.perf_counter()
+        pages = tables = 0
+
+        try:
+            with self.profiler.call():
+                iterator = (
+                    self._iter_rendered(pdf_path, render)
+                    if self.cache is None
+                    else self._iter_cached(pdf_path, render)
+                )
+                for page, result, seconds in iterator:
+                    table, text = result
+                    pages += 1
+                    tables += table is not None
+                    yield PageResult(
+                        page=page,
+                        table=table,
+                        text=text,
+                        seconds=seconds,
+                        since_start=time.perf_counter() - start,
+                        failed=isinstance(result, FailedPage),
+                    )
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics.calls += 1
+            self.metrics.pages += pages
+            self.metrics.tables += tables
+            self.metrics.last_call_seconds = elapsed
+            self.metrics.total_call_seconds += elapsed
+
+    async def aiter_pages(
+        self, pdf_path: str, render: RenderConfig | None = None
+    ) -> AsyncIterator[PageResult]:
+        """Async version of iter_pages: the extraction runs in a worker thread
+        that waits once `async_buffer` results are queued, and leaving the
+        loop or cancelling the consumer stops it after the page in progress."""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.cfg.async_buffer)
+        cancelled = threading.Event()
+        finished = object()
+
+        def publish(item):
+            """Blocks the worker thread while the queue is full"""
+            if cancelled.is_set():
+                return
+            try:
+                future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            except RuntimeError:
+                # the event loop is already closed
+                cancelled.set()
+                return
+            while True:
+                try:
+                    future.result(timeout=0.1)
+                    return
+                except concurrent.futures.TimeoutError:
+                    # the consumer left, nobody is going to empty the queue
+                    if cancelled.is_set():
+                        future.cancel()
+                        return
+                except concurrent.futures.CancelledError:
+                    cancelled.set()
+                    return
+
+        def produce():
+            try:
+                with closing(self.iter_pages(pdf_path, render)) as results:
+                    for result in results:
+                        if cancelled.is_set():
+                            break
+                        publish(result)
+            except Exception as e:
+                publish(e)
+            finally:
+                publish(finished)
+
+        loop.run_in_executor(None, produce)
+        try:
+            while (item := await queue.get()) is not finished:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+
+    def extract_tables(
+        self, pdf_path: str, render: RenderConfig | None = None
+    ) -> tuple[list[pd.DataFrame | None], list[str | None]]:
+        results = sorted(self.iter_pages(pdf_path, render), key=lambda r: r.page)
+        return [result.table for result in results], [
+            result.text for result in results
+        ]
+
+
+_engine: ExtractionEngine | None = None
+_engine_lock = threading.Lock()
+
+
+def get_engine(cfg: EngineConfig | None = None) -> ExtractionEngine:
+    """Returns the process-wide engine, creating it on first use.
+
+    Raises ValueError if cfg differs from the configuration the engine was
+    created with, build an ExtractionEngine directly to use another one."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = ExtractionEngine(cfg)
+        elif cfg is not None and cfg != _engine.cfg:
+            raise ValueError(
+                "The extraction engine was already created with another "
+                f"configuration: {_engine.cfg}"
+            )
+        return _engine
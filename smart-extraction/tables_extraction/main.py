@@ -1,62 +1,43 @@
+from typing import AsyncIterator, Iterator
+
 import pandas as pd
-import torch
-from tables_extraction.models import YoloDetector, YoloConfig, TatrExtractor, TatrConfig
-from tables_extraction.processing import ImageProcessor as Processor, Ocr, OcrConfig
-
-from tables_extraction.processing.deskewer import deskew_pil
-
-
-def extract_tables(pdf_path: str) -> list[pd.DataFrame | None]:
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-
-    pages = Processor.pdf_path_pages(pdf_path)
-    detection_model = YoloDetector(
-        YoloConfig(device=device),
-    )
-    extraction_model = TatrExtractor(
-        TatrConfig(device=device),
-    )
-    ocr_runtime = Ocr(
-        OcrConfig(language="ru"),
-    )
-
-    texts = []
-    table_dfs = []
-
-    for page in pages:
-        try:
-            page = deskew_pil(page)
-            detection_result = detection_model.detect(page)
-            if len(detection_result) == 0:
-                table_dfs.append(None)
-                texts.append(None)
-                continue
-            bbox = detection_model.get_max_area_bbox(detection_result)
-
-            layout = Processor.cxcywh2xyxy(bbox)
-            layout = Processor.xyxy_add_margin(layout, margin=[20, -5, 20, 20])
-            table_image = page.crop(layout)
-
-            objects = TatrExtractor.outputs_to_objects(
-                extraction_model.extract(table_image),
-                table_image.size,
-                extraction_model.id2label,
-            )
-            if len(objects) == 0:
-                table_dfs.append(None)
-                texts.append(None)
-                continue
-            coordinates = extraction_model.get_object_coordinates(objects)
-
-            outputs = ocr_runtime.run_on_coordinates(table_image, coordinates)
-            data = ocr_runtime.merge_data(outputs)
-
-            table_dfs.append(pd.DataFrame(data))
-            texts.append(ocr_runtime.run_on_whole_page(page))
-
-        except Exception as e:
-            print(e)
-            table_dfs.append(None)
-            texts.append(None)
-
-    return table_dfs, texts
+
+from tables_extraction.engine import ExtractionEngine, PageResult, get_engine
+from tables_extraction.parallel import get_pool
+from tables_extraction.processing import RenderConfig
+
+
+def warmup() -> ExtractionEngine:
+    engine = get_engine()
+    engine.warmup()
+    return engine
+
+
+def extract_tables(
+    pdf_path: str, render: RenderConfig | None = None, workers: int = 1
+) -> tuple[list[pd.DataFrame | None], list[str | None]]:
+    if workers > 1:
+        return get_pool(workers).extract_tables(pdf_path, render)
+    return get_engine().extract_tables(pdf_path, render)
+
+
+def iter_pages(
+    pdf_path: str, render: RenderConfig | None = None
+) -> Iterator[PageResult]:
+    return get_engine().iter_pages(pdf_path, render)
+
+
+def aiter_pages(
+    pdf_path: str, render: RenderConfig | None = None
+) -> AsyncIterator[PageResult]:
+    return get_engine().aiter_pages(pdf_path, render)
+
+
+def metrics(fmt: str = "json") -> str:
+    """Stage timings of the shared engine as JSON or Prometheus text"""
+    profiler = get_engine().profiler
+    if fmt == "json":
+        return profiler.to_json()
+    if fmt == "prometheus":
+        return profiler.to_prometheus()
+    raise ValueError(f"Unknown metrics format: {fmt}")
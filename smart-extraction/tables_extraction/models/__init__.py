@@ -1,3 +1,4 @@
-from . import tatr, yolo
+from . import onnx_backend, tatr, yolo
+from .onnx_backend import OnnxConfig
 from .yolo import YoloDetector, YoloConfig
 from .tatr import TatrExtractor, TatrConfig
@@ -0,0 +1,84 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+
+def default_onnx_dir() -> str:
+    return os.environ.get(
+        "TABLES_ONNX_DIR", str(Path.home() / ".cache" / "tables_extraction" / "onnx")
+    )
+
+
+@dataclass
+class OnnxConfig:
+    """Settings of the ONNX Runtime backend shared by YoloConfig and TatrConfig"""
+
+    # exported (and quantized) models are kept here between runs
+    directory: str = ""
+    # dynamic int8 quantization of the weights
+    quantize: bool = False
+    # 0 lets onnxruntime pick
+    intra_op_threads: int = 0
+    inter_op_threads: int = 0
+    opset: int = 17
+
+    def __post_init__(self):
+        self.directory = self.directory or default_onnx_dir()
+
+    def model_path(self, name: str) -> Path:
+        suffix = ".int8.onnx" if self.quantize else ".onnx"
+        return Path(self.directory) / f"{name.replace('/', '--')}{suffix}"
+
+
+def import_onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise ImportError(
+            "The onnx backend needs onnxruntime: pip install onnxruntime"
+        ) from e
+    return onnxruntime
+
+
+def quantize(source: Path, target: Path):
+    import_onnxruntime()
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(source), str(target), weight_type=QuantType.QInt8)
+
+
+def prepare(cfg: OnnxConfig, name: str, export) -> Path:
+    """Returns the model file, calling export(path) and quantizing when missing"""
+    path = cfg.model_path(name)
+    if path.exists():
+        return path
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fp32_path = path.with_name(f"{name.replace('/', '--')}.onnx")
+    if not fp32_path.exists():
+        export(fp32_path)
+    if cfg.quantize:
+        quantize(fp32_path, path)
+    return path
+
+
+class OnnxSession:
+    def __init__(self, path: Path, cfg: OnnxConfig):
+        ort = import_onnxruntime()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = cfg.intra_op_threads
+        options.inter_op_num_threads = cfg.inter_op_threads
+        if cfg.inter_op_threads > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+
+        self.session = ort.InferenceSession(
+            str(path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [item.name for item in self.session.get_inputs()]
+
+    def run(self, *inputs: np.ndarray) -> list[np.ndarray]:
+        return self.session.run(None, dict(zip(self.input_names, inputs)))
@@ -1,7 +1,14 @@
-from tables_extraction.processing import ImageProcessor
+from tables_extraction.models.onnx_backend import OnnxConfig, OnnxSession, prepare
+from tables_extraction.processing import ImageProcessor, TableGrid
 from transformers import TableTransformerForObjectDetection
+from transformers.models.table_transformer.modeling_table_transformer import (
+    TableTransformerObjectDetectionOutput,
+)
+import torch
+import cv2
+import numpy as np
 from PIL import Image
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from torchvision import transforms
 
 
@@ -25,7 +32,23 @@ class TatrConfig:
     device: str = "cpu"
     model: str = "microsoft/table-structure-recognition-v1.1-all"
     image_size: int = 1000
-    confidence_threshold = 0.85
+    confidence_threshold: float = 0.85
+    batch_size: int = 4
+    # "torch" or "onnx" (onnxruntime on cpu)
+    backend: str = "torch"
+    onnx: OnnxConfig = field(default_factory=OnnxConfig)
+
+
+class TatrOnnxWrapper(torch.nn.Module):
+    """Returns plain tensors so that the model can be traced for export"""
+
+    def __init__(self, model: TableTransformerForObjectDetection):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values, pixel_mask):
+        outputs = self.model(pixel_values=pixel_values, pixel_mask=pixel_mask)
+        return outputs.logits, outputs.pred_boxes
 
 
 class TatrExtractor:
@@ -33,9 +56,11 @@ class TatrExtractor:
         self.cfg = cfg
         self.model = TableTransformerForObjectDetection.from_pretrained(self.cfg.model)
         self.model.to(self.cfg.device)
+        self.model.eval()
 
         self.id2label = self.model.config.id2label.copy()
         self.id2label[len(self.id2label)] = "no object"
+        self.label2id = {label: idx for idx, label in self.id2label.items()}
 
         self.transforms = transforms.Compose(
             [
@@ -44,81 +69,127 @@ class TatrExtractor:
             ]
         )
 
-    def extract(self, image: Image.Image):
-        return self.model(self.transforms(image).unsqueeze(0).to(self.cfg.device))
-
-    @staticmethod
-    def outputs_to_objects(outputs, img_size, id2label) -> list[dict]:
-        m = outputs.logits.softmax(-1).max(-1)
-        pred_labels = list(m.indices.detach().cpu().numpy())[0]
-        pred_scores = list(m.values.detach().cpu().numpy())[0]
-        pred_bboxes = outputs["pred_boxes"].detach().cpu()[0]
-        pred_bboxes = [
-            elem.tolist()
-            for elem in ImageProcessor.rescale_torch_box(pred_bboxes, img_size)
-        ]
-
-        objects = []
-        for label, score, bbox in zip(pred_labels, pred_scores, pred_bboxes):
-            class_label = id2label[int(label)]
-            if not class_label == "no object":
-                objects.append(
-                    {
-                        "label": class_label,
-                        "score": float(score),
-                        "bbox": [float(elem) for elem in bbox],
-                    }
-                )
-
-        filtered_objects = []
-        for obj in objects:
-            if obj["score"] < 0.85:
-                continue
+        self.session = None
+        if self.cfg.backend == "onnx":
+            self.session = OnnxSession(
+                prepare(self.cfg.onnx, self.cfg.model, self.export_onnx), self.cfg.onnx
+            )
+        elif self.cfg.backend != "torch":
+            raise ValueError(f"Unknown TATR backend: {self.cfg.backend}")
 
-            filtered_objects.append(obj)
+    def export_onnx(self, path):
+        pixel_values = torch.rand((1, 3, self.cfg.image_size, self.cfg.image_size))
+        pixel_mask = torch.ones(
+            (1, self.cfg.image_size, self.cfg.image_size), dtype=torch.long
+        )
+        torch.onnx.export(
+            TatrOnnxWrapper(self.model.to("cpu")),
+            (pixel_values, pixel_mask),
+            str(path),
+            input_names=["pixel_values", "pixel_mask"],
+            output_names=["logits", "pred_boxes"],
+            dynamic_axes={
+                "pixel_values": {0: "batch", 2: "height", 3: "width"},
+                "pixel_mask": {0: "batch", 1: "height", 2: "width"},
+                "logits": {0: "batch"},
+                "pred_boxes": {0: "batch"},
+            },
+            opset_version=self.cfg.onnx.opset,
+        )
+        self.model.to(self.cfg.device)
 
-        return filtered_objects
+    def forward(self, pixel_values: torch.Tensor, pixel_mask: torch.Tensor):
+        if self.session is not None:
+            logits, pred_boxes = self.session.run(
+                pixel_values.numpy(), pixel_mask.numpy()
+            )
+            return TableTransformerObjectDetectionOutput(
+                logits=torch.from_numpy(logits), pred_boxes=torch.from_numpy(pred_boxes)
+            )
 
-    @staticmethod
-    def to_object_coordinates(row, column):
-        cell_bbox = [
-            column["bbox"][0],
-            row["bbox"][1],
-            column["bbox"][2],
-            row["bbox"][3],
-        ]
-        return cell_bbox
-
-    @staticmethod
-    def get_object_coordinates(objects: list[dict]) -> list[dict]:
-        rows = [entry for entry in objects if entry["label"] == "table row"]
-        columns = [entry for entry in objects if entry["label"] == "table column"]
-
-        rows.sort(key=lambda x: x["bbox"][1])
-        columns.sort(key=lambda x: x["bbox"][0])
-
-        # Generate cell coordinates and count cells in each row
-        coordinates = []
-
-        for row in rows:
-            row_cells = []
-            for column in columns:
-                cell_bbox = TatrExtractor.to_object_coordinates(row, column)
-                row_cells.append({"column": column["bbox"], "cell": cell_bbox})
-
-            # Sort cells in the row by X coordinate
-            row_cells.sort(key=lambda x: x["column"][0])
-
-            # Append row information to cell_coordinates
-            coordinates.append(
-                {
-                    "row": row["bbox"],
-                    "score": row["score"],
-                    "cells": row_cells,
-                    "cell_count": len(row_cells),
-                },
+        with torch.inference_mode():
+            return self.model(
+                pixel_values=pixel_values.to(self.cfg.device),
+                pixel_mask=pixel_mask.to(self.cfg.device),
             )
 
-        coordinates.sort(key=lambda x: x["row"][1])
+    def to_tensor(self, image: Image.Image | np.ndarray) -> torch.Tensor:
+        if isinstance(image, Image.Image):
+            return self.transforms(image)
+
+        # resize the uint8 crop first so that only the small image is converted
+        height, width = image.shape[:2]
+        scale = self.cfg.image_size / max(width, height)
+        resized = cv2.resize(
+            image,
+            (int(round(scale * width)), int(round(scale * height))),
+            interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC,
+        )
+        return torch.from_numpy(resized).permute(2, 0, 1).float().div_(255)
 
-        return coordinates
+    def extract(self, image: Image.Image | np.ndarray):
+        pixel_values = self.to_tensor(image).unsqueeze(0)
+        pixel_mask = torch.ones(
+            (1, pixel_values.shape[2], pixel_values.shape[3]), dtype=torch.long
+        )
+        return self.forward(pixel_values, pixel_mask)
+
+    def extract_batch(self, images: list[Image.Image | np.ndarray]):
+        """Runs one forward pass over several crops padded to a common size"""
+        tensors = [self.to_tensor(image) for image in images]
+        height = max(tensor.shape[1] for tensor in tensors)
+        width = max(tensor.shape[2] for tensor in tensors)
+
+        pixel_values = torch.zeros((len(tensors), 3, height, width))
+        # predicted boxes are relative to the unpadded area marked by the mask
+        pixel_mask = torch.zeros((len(tensors), height, width), dtype=torch.long)
+        for idx, tensor in enumerate(tensors):
+            pixel_values[idx, :, : tensor.shape[1], : tensor.shape[2]] = tensor
+            pixel_mask[idx, : tensor.shape[1], : tensor.shape[2]] = 1
+
+        return self.forward(pixel_values, pixel_mask)
+
+    def extract_grids_batch(
+        self, images: list[Image.Image | np.ndarray]
+    ) -> list[TableGrid]:
+        """Returns the structure of every crop, in the same order"""
+        grids = []
+        for start in range(0, len(images), self.cfg.batch_size):
+            chunk = images[start : start + self.cfg.batch_size]
+            grids.extend(
+                self.outputs_to_grids_batch(
+                    self.extract_batch(chunk),
+                    [ImageProcessor.image_size(image) for image in chunk],
+                )
+            )
+        return grids
+
+    def outputs_to_grid(self, outputs, img_size) -> TableGrid:
+        return self.outputs_to_grids_batch(outputs, [img_size])[0]
+
+    def outputs_to_grids_batch(self, outputs, img_sizes) -> list[TableGrid]:
+        scores, labels = outputs.logits.softmax(-1).max(-1)
+        scores = scores.detach().cpu().numpy()
+        labels = labels.detach().cpu().numpy()
+        boxes = outputs["pred_boxes"].detach().cpu().numpy()
+
+        # cxcywh relative to the crop -> xyxy in crop pixels
+        sizes = np.array([[w, h, w, h] for w, h in img_sizes], dtype=np.float32)
+        boxes = np.concatenate(
+            [boxes[..., :2] - boxes[..., 2:] / 2, boxes[..., :2] + boxes[..., 2:] / 2],
+            axis=-1,
+        ) * sizes[:, None, :]
+
+        confident = scores >= self.cfg.confidence_threshold
+        row_mask = confident & (labels == self.label2id["table row"])
+        column_mask = confident & (labels == self.label2id["table column"])
+
+        return [
+            TableGrid.from_boxes(
+                boxes[idx][row_mask[idx]],
+                boxes[idx][column_mask[idx]],
+                scores[idx][row_mask[idx]],
+                scores[idx][column_mask[idx]],
+            )
+            for idx in range(len(img_sizes))
+        ]
@@ -1,7 +1,15 @@
+import shutil
+
 from PIL import Image
 import numpy as np
+import torch
 from ultralyticsplus import YOLO
-from dataclasses import dataclass
+from ultralytics.data.augment import LetterBox
+from ultralytics.engine.results import Results
+from ultralytics.utils import ops
+from dataclasses import dataclass, field
+
+from tables_extraction.models.onnx_backend import OnnxConfig, OnnxSession, prepare
 
 
 @dataclass(kw_only=True)
@@ -12,6 +20,11 @@ class YoloConfig:
     iou_threshold = 0.3
     agnostic_nms = False
     max_detection_objects = 50
+    batch_size: int = 8
+    # "torch" or "onnx" (onnxruntime on cpu)
+    backend: str = "torch"
+    onnx: OnnxConfig = field(default_factory=OnnxConfig)
+    image_size: int = 640
 
 
 class YoloDetector:
@@ -25,8 +38,74 @@ class YoloDetector:
         self.model.overrides["max_det"] = self.cfg.max_detection_objects
         self.model.to(self.cfg.device)
 
-    def detect(self, image: Image.Image):
-        return self.model.predict(image)[0]
+        self.session = None
+        if self.cfg.backend == "onnx":
+            self.letterbox = LetterBox(
+                (self.cfg.image_size, self.cfg.image_size), auto=False
+            )
+            self.session = OnnxSession(
+                prepare(self.cfg.onnx, self.cfg.model, self.export_onnx), self.cfg.onnx
+            )
+        elif self.cfg.backend != "torch":
+            raise ValueError(f"Unknown YOLO backend: {self.cfg.backend}")
+
+    def export_onnx(self, path):
+        exported = self.model.export(
+            format="onnx",
+            imgsz=self.cfg.image_size,
+            dynamic=True,
+            opset=self.cfg.onnx.opset,
+            device="cpu",
+        )
+        shutil.move(exported, path)
+
+    @staticmethod
+    def to_bgr(image: Image.Image | np.ndarray) -> np.ndarray:
+        """ultralytics treats arrays as BGR, as in LoadPilAndNumpy; RGB arrays
+        are flipped as a view"""
+        if isinstance(image, Image.Image):
+            image = np.asarray(image.convert("RGB"))
+        return image[..., ::-1]
+
+    def predict(self, images: list[Image.Image | np.ndarray]) -> list:
+        if self.session is None:
+            return self.model.predict([self.to_bgr(image) for image in images])
+
+        originals = [self.to_bgr(image) for image in images]
+        batch = np.stack([self.letterbox(image=image) for image in originals])
+        batch = np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2))
+        batch = batch.astype(np.float32) / 255
+
+        predictions = ops.non_max_suppression(
+            torch.from_numpy(self.session.run(batch)[0]),
+            self.cfg.confidence_threshold,
+            self.cfg.iou_threshold,
+            agnostic=self.cfg.agnostic_nms,
+            max_det=self.cfg.max_detection_objects,
+        )
+
+        results = []
+        for original, prediction in zip(originals, predictions):
+            prediction[:, :4] = ops.scale_boxes(
+                batch.shape[2:], prediction[:, :4], original.shape
+            )
+            results.append(
+                Results(original, path="", names=self.model.names, boxes=prediction)
+            )
+        return results
+
+    def detect(self, image: Image.Image | np.ndarray):
+        return self.predict([image])[0]
+
+    def detect_batch(
+        self, images: list[Image.Image | np.ndarray], batch_size: int | None = None
+    ):
+        """Returns one result per image, in the same order"""
+        batch_size = batch_size or self.cfg.batch_size
+        results = []
+        for start in range(0, len(images), batch_size):
+            results.extend(self.predict(images[start : start + batch_size]))
+        return results
 
     @staticmethod
     def get_max_area_bbox(yolo_result) -> np.ndarray:
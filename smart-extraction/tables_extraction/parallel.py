@@ -0,0 +1,116 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+
+import pandas as pd
+import torch
+
+from tables_extraction.engine import EngineConfig, ExtractionEngine
+from tables_extraction.processing import ImageProcessor as Processor, RenderConfig
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ParallelConfig:
+    workers: int = field(default_factory=lambda: os.cpu_count() or 1)
+    # pages rendered and extracted by one task
+    chunk_size: int = 4
+    # torch intra-op threads per worker, defaults to an even share of the cores
+    threads_per_worker: int | None = None
+    engine: EngineConfig = field(default_factory=lambda: EngineConfig(device="cpu"))
+
+    def worker_threads(self) -> int:
+        if self.threads_per_worker is not None:
+            return self.threads_per_worker
+        return max(1, (os.cpu_count() or 1) // self.workers)
+
+
+# engine owned by the current worker process
+_worker_engine: ExtractionEngine | None = None
+
+
+def _init_worker(engine_cfg: EngineConfig, threads: int):
+    global _worker_engine
+    torch.set_num_threads(threads)
+    _worker_engine = ExtractionEngine(engine_cfg)
+    _worker_engine.warmup(run_inference=False)
+
+
+def _extract_chunk(pdf_path: str, render: RenderConfig):
+    return _worker_engine.extract_tables(pdf_path, render)
+
+
+class ParallelExtractor:
+    """Spreads page chunks of a document across a pool of worker processes,
+    each holding its own warm ExtractionEngine."""
+
+    def __init__(self, cfg: ParallelConfig | None = None):
+        self.cfg = cfg or ParallelConfig()
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.cfg.workers,
+            # forked workers would inherit torch/CUDA state of the parent
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.cfg.engine, self.cfg.worker_threads()),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def chunks(self, pdf_path: str, render: RenderConfig) -> list[RenderConfig]:
+        pages = render.page_range(Processor.pdf_path_page_count(pdf_path))
+        return [
+            replace(
+                render,
+                first_page=start,
+                last_page=min(start + self.cfg.chunk_size, pages.stop) - 1,
+            )
+            for start in range(pages.start, pages.stop, self.cfg.chunk_size)
+        ]
+
+    def extract_tables(
+        self, pdf_path: str, render: RenderConfig | None = None
+    ) -> tuple[list[pd.DataFrame | None], list[str | None]]:
+        chunks = self.chunks(pdf_path, render or self.cfg.engine.render)
+        futures = [
+            self.executor.submit(_extract_chunk, pdf_path, chunk) for chunk in chunks
+        ]
+
+        texts = []
+        table_dfs = []
+        for chunk, future in zip(chunks, futures):
+            try:
+                chunk_dfs, chunk_texts = future.result()
+            except Exception:
+                logger.exception(
+                    "pages %s-%s of %s failed", chunk.first_page, chunk.last_page, pdf_path
+                )
+                chunk_size = chunk.last_page - chunk.first_page + 1
+                chunk_dfs, chunk_texts = [None] * chunk_size, [None] * chunk_size
+
+            table_dfs.extend(chunk_dfs)
+            texts.extend(chunk_texts)
+
+        return table_dfs, texts
+
+
+_pools: dict[int, ParallelExtractor] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(workers: int) -> ParallelExtractor:
+    """Returns the process-wide pool with the given number of workers"""
+    with _pools_lock:
+        if workers not in _pools:
+            _pools[workers] = ParallelExtractor(ParallelConfig(workers=workers))
+        return _pools[workers]
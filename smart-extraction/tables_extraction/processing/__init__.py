@@ -1,3 +1,6 @@
-from . import image, ocr
-from .image import ImageProcessor
+from . import grid, image, ocr, prefilter, text_layer
+from .grid import TableGrid
+from .image import ImageProcessor, RenderConfig
 from .ocr import Ocr, OcrConfig
+from .prefilter import TablePrefilter, PrefilterConfig, PrefilterResult
+from .text_layer import TextLayer, TextLayerConfig, PageWords
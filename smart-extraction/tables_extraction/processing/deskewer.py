@@ -1,4 +1,5 @@
 import math
+from dataclasses import dataclass
 from typing import Union, Tuple
 
 import numpy as np
@@ -7,32 +8,96 @@ from deskew import determine_skew
 from PIL import Image
 
 
-def rotate(
-        image: np.ndarray,
-        angle: float,
-        background: Union[int, Tuple[int, int, int]]
-) -> np.ndarray:
-    old_width, old_height = image.shape[:2]
+def rotation_matrix(
+        shape: Tuple[int, ...],
+        angle: float
+) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Affine matrix used by `rotate` for an image of this shape and the
+    (width, height) of the rotated image"""
+    old_width, old_height = shape[:2]
     angle_radian = math.radians(angle)
     width = abs(np.sin(angle_radian) * old_height) + abs(np.cos(angle_radian) * old_width)
     height = abs(np.sin(angle_radian) * old_width) + abs(np.cos(angle_radian) * old_height)
 
-    image_center = tuple(np.array(image.shape[1::-1]) / 2)
+    image_center = tuple(np.array(shape[1::-1]) / 2)
     rot_mat = cv2.getRotationMatrix2D(image_center, angle, 1.0)
     rot_mat[1, 2] += (width - old_width) / 2
     rot_mat[0, 2] += (height - old_height) / 2
-    return cv2.warpAffine(image, rot_mat, (int(round(height)), int(round(width))),
-                          borderValue=background)
+    return rot_mat, (int(round(height)), int(round(width)))
+
+
+def rotate(
+        image: np.ndarray,
+        angle: float,
+        background: Union[int, Tuple[int, int, int]]
+) -> np.ndarray:
+    rot_mat, size = rotation_matrix(image.shape, angle)
+    return cv2.warpAffine(image, rot_mat, size, borderValue=background)
+
+
+@dataclass
+class DeskewConfig:
+    # "full": estimate the angle on the full resolution page and always rotate
+    # "fast": estimate on a downscaled page and rotate only when needed
+    mode: str = "full"
+    # longest side of the page used for angle estimation in "fast" mode
+    max_size: int = 1000
+    # canny sigma of determine_skew, smaller suits the downscaled page
+    sigma: float = 1.0
+    # angles below this many degrees are not worth a warpAffine
+    min_angle: float = 0.5
+
+
+def to_grayscale(image: np.ndarray) -> np.ndarray:
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def estimate_skew_fast(image: np.ndarray, cfg: DeskewConfig = DeskewConfig()) -> float:
+    grayscale = to_grayscale(image)
+    scale = cfg.max_size / max(grayscale.shape)
+    if scale < 1:
+        grayscale = cv2.resize(
+            grayscale, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+        )
+    # determine_skew runs canny edge detection before the hough transform
+    angle = determine_skew(grayscale, sigma=cfg.sigma)
+    return 0.0 if angle is None else float(angle)
 
 
 def deskew(image: np.ndarray) -> np.ndarray:
-    grayscale = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    grayscale = to_grayscale(image)
     angle = determine_skew(grayscale)
     rotated = rotate(image, angle, 255)
     return rotated
 
 
-def deskew_pil(image: Image.Image) -> Image.Image:
-    array = np.array(image)
-    deskewed_array = deskew(array)
+def deskew_fast(
+    image: np.ndarray, cfg: DeskewConfig = DeskewConfig()
+) -> tuple[np.ndarray, float]:
+    """Returns the deskewed image and the applied angle, 0 if not rotated"""
+    angle = estimate_skew_fast(image, cfg)
+    if abs(angle) < cfg.min_angle:
+        return image, 0.0
+    return rotate(image, angle, 255), angle
+
+
+def deskew_array(
+    image: np.ndarray, cfg: DeskewConfig = DeskewConfig()
+) -> tuple[np.ndarray, float]:
+    """Returns the deskewed image and the applied angle; in "fast" mode an
+    unrotated page is the input array itself"""
+    if cfg.mode == "full":
+        angle = determine_skew(to_grayscale(image))
+        return rotate(image, angle, 255), angle
+    if cfg.mode == "fast":
+        return deskew_fast(image, cfg)
+    raise ValueError(f"Unknown deskew mode: {cfg.mode}")
+
+
+def deskew_pil(image: Image.Image, cfg: DeskewConfig = DeskewConfig()) -> Image.Image:
+    deskewed_array, angle = deskew_array(np.asarray(image), cfg)
+    if cfg.mode == "fast" and angle == 0:
+        return image
     return Image.fromarray(deskewed_array)
@@ -0,0 +1,70 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class TableGrid:
+    """Table structure as arrays of xyxy boxes in table crop pixels
+
+    Rows are sorted top to bottom and columns left to right; a cell is the
+    intersection of its row's y range and its column's x range."""
+
+    rows: np.ndarray
+    columns: np.ndarray
+    row_scores: np.ndarray
+    column_scores: np.ndarray
+
+    @staticmethod
+    def from_boxes(
+        rows: np.ndarray,
+        columns: np.ndarray,
+        row_scores: np.ndarray,
+        column_scores: np.ndarray,
+    ) -> "TableGrid":
+        row_order = np.argsort(rows[:, 1], kind="stable")
+        column_order = np.argsort(columns[:, 0], kind="stable")
+        return TableGrid(
+            rows=rows[row_order].astype(np.float32, copy=False),
+            columns=columns[column_order].astype(np.float32, copy=False),
+            row_scores=row_scores[row_order].astype(np.float32, copy=False),
+            column_scores=column_scores[column_order].astype(np.float32, copy=False),
+        )
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.rows), len(self.columns)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.rows) == 0 or len(self.columns) == 0
+
+    @property
+    def cell_count(self) -> int:
+        return len(self.rows) * len(self.columns)
+
+    @property
+    def cells(self) -> np.ndarray:
+        """(rows, columns, 4) array of cell boxes"""
+        n_rows, n_columns = self.shape
+        cells = np.empty((n_rows, n_columns, 4), dtype=np.float32)
+        cells[:, :, 0] = self.columns[None, :, 0]
+        cells[:, :, 1] = self.rows[:, None, 1]
+        cells[:, :, 2] = self.columns[None, :, 2]
+        cells[:, :, 3] = self.rows[:, None, 3]
+        return cells
+
+    def locate(self, points: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Row and column index of the nearest cell for every (x, y) point"""
+
+        def nearest(values, boxes, start, end):
+            distance = np.maximum(
+                np.maximum(boxes[None, :, start] - values[:, None], 0),
+                values[:, None] - boxes[None, :, end],
+            )
+            return distance.argmin(axis=1)
+
+        return (
+            nearest(points[:, 1], self.rows, 1, 3),
+            nearest(points[:, 0], self.columns, 0, 2),
+        )
@@ -1,9 +1,39 @@
+import io
+import subprocess
+from typing import Iterator
+from dataclasses import dataclass
+
 from PIL import Image
 import numpy as np
 import pdf2image
 import torch
 
 
+@dataclass
+class RenderConfig:
+    dpi: int = 200
+    grayscale: bool = False
+    # 1-based and inclusive, as in pdf2image
+    first_page: int | None = None
+    last_page: int | None = None
+    # number of pages rasterized per pdftoppm call
+    window: int = 1
+    # multi-resolution mode when set: pages are rendered at `dpi` for deskew
+    # and detection only, and every detected table region is rendered again
+    # at `table_dpi` for structure recognition and cell OCR
+    table_dpi: int | None = None
+
+    @property
+    def table_scale(self) -> float:
+        """Page pixels to table crop pixels"""
+        return (self.table_dpi or self.dpi) / self.dpi
+
+    def page_range(self, page_count: int) -> range:
+        first = max(self.first_page or 1, 1)
+        last = min(self.last_page or page_count, page_count)
+        return range(first, last + 1)
+
+
 class ImageProcessor:
     @staticmethod
     def pdf_path_pages(pdf_path: str) -> list[Image.Image]:
@@ -13,6 +43,82 @@ class ImageProcessor:
     def pdf_bytes_pages(pdf_bytes: bytes) -> list[Image.Image]:
         return pdf2image.convert_from_bytes(pdf_bytes)
 
+    @staticmethod
+    def pdf_path_page_count(pdf_path: str) -> int:
+        return pdf2image.pdfinfo_from_path(pdf_path)["Pages"]
+
+    @staticmethod
+    def pdf_bytes_page_count(pdf_bytes: bytes) -> int:
+        return pdf2image.pdfinfo_from_bytes(pdf_bytes)["Pages"]
+
+    @staticmethod
+    def iter_pdf_path_pages(
+        pdf_path: str, cfg: RenderConfig = RenderConfig()
+    ) -> Iterator[Image.Image]:
+        """Renders pages lazily, holding at most `cfg.window` pages at a time"""
+        pages = cfg.page_range(ImageProcessor.pdf_path_page_count(pdf_path))
+        for start in range(pages.start, pages.stop, cfg.window):
+            yield from pdf2image.convert_from_path(
+                pdf_path,
+                dpi=cfg.dpi,
+                grayscale=cfg.grayscale,
+                first_page=start,
+                last_page=min(start + cfg.window, pages.stop) - 1,
+            )
+
+    @staticmethod
+    def iter_pdf_bytes_pages(
+        pdf_bytes: bytes, cfg: RenderConfig = RenderConfig()
+    ) -> Iterator[Image.Image]:
+        """Renders pages lazily, holding at most `cfg.window` pages at a time"""
+        pages = cfg.page_range(ImageProcessor.pdf_bytes_page_count(pdf_bytes))
+        for start in range(pages.start, pages.stop, cfg.window):
+            yield from pdf2image.convert_from_bytes(
+                pdf_bytes,
+                dpi=cfg.dpi,
+                grayscale=cfg.grayscale,
+                first_page=start,
+                last_page=min(start + cfg.window, pages.stop) - 1,
+            )
+
+    @staticmethod
+    def render_region(
+        pdf_path: str,
+        page_number: int,
+        bbox,
+        dpi: int,
+        grayscale: bool = False,
+        timeout: int | None = None,
+    ) -> np.ndarray:
+        """Renders only the xyxy box of one page, given in pixels at `dpi`"""
+        x0, y0, x1, y1 = (int(round(float(value))) for value in bbox)
+        output = subprocess.run(
+            [
+                "pdftoppm",
+                "-r",
+                str(dpi),
+                "-f",
+                str(page_number),
+                "-l",
+                str(page_number),
+                "-x",
+                str(x0),
+                "-y",
+                str(y0),
+                "-W",
+                str(max(x1 - x0, 1)),
+                "-H",
+                str(max(y1 - y0, 1)),
+                "-singlefile",
+                *(["-gray"] if grayscale else []),
+                pdf_path,
+            ],
+            capture_output=True,
+            check=True,
+            timeout=timeout,
+        ).stdout
+        return np.asarray(Image.open(io.BytesIO(output)))
+
     @staticmethod
     def cxcywh2xywh(bbox):
         return bbox[0] - bbox[2] / 2, bbox[1] - bbox[3] / 2, bbox[2], bbox[3]
@@ -48,28 +154,75 @@ class ImageProcessor:
         )
 
     @staticmethod
-    def add_padding(pil_image: Image, padding: int | list, color: int = 255) -> Image:
+    def add_padding(
+        image: Image.Image | np.ndarray, padding: int | list, color: int = 255
+    ) -> Image.Image | np.ndarray:
+        """Pads top, left, bottom, right; returns the same type it was given"""
         if isinstance(padding, int):
             padding = [padding, padding, padding, padding]
 
-        original_image = np.array(pil_image)
+        original_image = ImageProcessor.as_array(image)
+        height, width = original_image.shape[:2]
 
-        new_image = (
-            np.ones(
-                (
-                    original_image.shape[0] + padding[0] + padding[2],
-                    original_image.shape[1] + padding[1] + padding[3],
-                    original_image.shape[2],
-                ),
-            )
-            * color
+        new_image = np.full(
+            (
+                height + padding[0] + padding[2],
+                width + padding[1] + padding[3],
+                *original_image.shape[2:],
+            ),
+            color,
+            dtype=np.uint8,
         )
         # put original image in the center
         new_image[
-            padding[0] : -padding[2], padding[1] : -padding[3], :
+            padding[0] : padding[0] + height, padding[1] : padding[1] + width
         ] = original_image
 
-        return Image.fromarray(new_image)
+        if isinstance(image, Image.Image):
+            return Image.fromarray(new_image)
+        return new_image
+
+    @staticmethod
+    def as_array(image: Image.Image | np.ndarray) -> np.ndarray:
+        """uint8 array of the image, without a copy when it already is one"""
+        if isinstance(image, np.ndarray):
+            return image
+        return np.asarray(image)
+
+    @staticmethod
+    def to_rgb_array(image: Image.Image | np.ndarray) -> np.ndarray:
+        """HxWx3 uint8 array; grayscale pages are broadcast, not copied"""
+        array = ImageProcessor.as_array(image)
+        if array.ndim == 2:
+            return np.broadcast_to(array[..., None], (*array.shape, 3))
+        if array.shape[2] == 4:
+            return array[..., :3]
+        return array
+
+    @staticmethod
+    def image_size(image: Image.Image | np.ndarray) -> tuple[int, int]:
+        """(width, height), as PIL's Image.size"""
+        if isinstance(image, np.ndarray):
+            return image.shape[1], image.shape[0]
+        return image.size
+
+    @staticmethod
+    def crop(array: np.ndarray, bbox) -> np.ndarray:
+        """View of the xyxy box, clipped to the image"""
+        height, width = array.shape[:2]
+        x0, y0, x1, y1 = ImageProcessor.clip_box(bbox, (width, height))
+        return array[y0:y1, x0:x1]
+
+    @staticmethod
+    def clip_box(bbox, size: tuple[int, int]) -> tuple[int, int, int, int]:
+        width, height = size
+        x0, y0, x1, y1 = (int(round(float(value))) for value in bbox)
+        return (
+            min(max(x0, 0), width),
+            min(max(y0, 0), height),
+            min(max(x1, 0), width),
+            min(max(y1, 0), height),
+        )
 
     @staticmethod
     def torch_box_cxcywh_to_xyxy(bbox):
@@ -4,10 +4,27 @@ from dataclasses import dataclass
 
 import numpy as np
 
+from tables_extraction.processing.grid import TableGrid
+from tables_extraction.processing.image import ImageProcessor
+
+# pages and crops are uint8 arrays (views where possible) or PIL images
+ImageLike = Image.Image | np.ndarray
+
 
 @dataclass
 class OcrConfig:
     language: str = "ru"
+    # "cells": detect and recognize every cell crop separately
+    # "table": detect text once on the whole table crop
+    # "batch": skip detection, recognize all cell crops as one batch
+    table_mode: str = "cells"
+    batch_size: int = 16
+    # easyocr merges boxes closer than width_ths * box height; keep it low
+    # in "table" mode so that neighbouring cells are not glued together
+    table_width_ths: float = 0.1
+    # "page": OCR the whole page, table included
+    # "outside_table": OCR only around the table and splice in its cell text
+    page_text_mode: str = "page"
 
 
 class Ocr:
@@ -15,45 +32,137 @@ class Ocr:
         self.cfg = cfg
         self.reader = easyocr.Reader([self.cfg.language])
 
-    def run_on_coordinates(self, image: Image.Image, coordinates: list[dict]):
-        data = dict()
-        max_num_columns = 0
-        for idx, row in enumerate(coordinates):
+    def run_on_table(self, image: ImageLike, grid: TableGrid):
+        if self.cfg.table_mode == "cells":
+            return self.run_on_coordinates(image, grid)
+        if self.cfg.table_mode == "table":
+            return self.run_table_detection(image, grid)
+        if self.cfg.table_mode == "batch":
+            return self.run_cells_batch(image, grid)
+        raise ValueError(f"Unknown table OCR mode: {self.cfg.table_mode}")
+
+    def run_table_detection(self, image: ImageLike, grid: TableGrid):
+        results = self.reader.readtext(
+            ImageProcessor.as_array(image),
+            width_ths=self.cfg.table_width_ths,
+            batch_size=self.cfg.batch_size,
+        )
+        return self.assign_to_cells(results, grid)
+
+    def run_cells_batch(self, image: ImageLike, grid: TableGrid):
+        if grid.empty:
+            return []
+
+        # easyocr takes [x_min, x_max, y_min, y_max] boxes
+        horizontal_list = grid.cells.reshape(-1, 4)[:, [0, 2, 1, 3]].astype(int)
+        results = self.reader.recognize(
+            ImageProcessor.as_array(image),
+            horizontal_list=horizontal_list.tolist(),
+            free_list=[],
+            batch_size=self.cfg.batch_size,
+        )
+        return self.assign_to_cells(
+            [result for result in results if result[1].strip() != ""], grid
+        )
+
+    @staticmethod
+    def assign_to_cells(results: list, grid: TableGrid):
+        """Places (box, text, confidence) results into the row/column grid
+        by the center of each box"""
+        n_rows, n_columns = grid.shape
+        cells = [[[] for _ in range(n_columns)] for _ in range(n_rows)]
+
+        if len(results) > 0 and not grid.empty:
+            centers = np.array(
+                [
+                    np.asarray(box, dtype=np.float32).mean(axis=0)
+                    for box, *_ in results
+                ]
+            )
+            row_indices, column_indices = grid.locate(centers)
+            for (cx, cy), row_idx, column_idx, (_, text, *_) in zip(
+                centers.tolist(), row_indices, column_indices, results
+            ):
+                cells[row_idx][column_idx].append((cy, cx, text))
+
+        return [
+            [" ".join(text for *_, text in sorted(cell)) for cell in row]
+            for row in cells
+        ]
+
+    def run_on_coordinates(self, image: ImageLike, grid: TableGrid):
+        image = ImageProcessor.as_array(image)
+        data = []
+        for row_cells in grid.cells:
             row_text = []
-            for cell in row["cells"]:
-                cell_image = np.array(image.crop(cell["cell"]))
+            for cell in row_cells:
+                cell_image = ImageProcessor.crop(image, cell)
+                if cell_image.size == 0:
+                    row_text.append("")
+                    continue
 
-                result = self.reader.readtext(np.array(cell_image))
+                result = self.reader.readtext(cell_image)
                 if len(result) > 0:
                     text = " ".join([x[1] for x in result])
                     row_text.append(text)
                 else:
                     row_text.append("")
 
-            if len(row_text) > max_num_columns:
-                max_num_columns = len(row_text)
-
-            data[idx] = row_text
-
-        for row, row_data in data.copy().items():
-            if len(row_data) != max_num_columns:
-                row_data = row_data + [
-                    "" for _ in range(max_num_columns - len(row_data))
-                ]
-            data[row] = row_data
+            data.append(row_text)
 
-        return [data[i] for i in range(0, len(data))]
+        return data
 
-    def run_on_whole_page(self, image: Image.Image) -> str:
+    def run_on_whole_page(self, image: ImageLike) -> str:
         return "\n".join(
             [
                 result
-                for result in
-                self.reader.readtext(np.array(image), paragraph=True, detail=0)
+                for result in self.reader.readtext(
+                    ImageProcessor.as_array(image), paragraph=True, detail=0
+                )
             ]
-
         )
 
+    def run_page_text(
+        self, image: ImageLike, layout: tuple, rows: list[list[str]]
+    ) -> str:
+        if self.cfg.page_text_mode == "page":
+            return self.run_on_whole_page(image)
+        if self.cfg.page_text_mode == "outside_table":
+            return self.run_around_table(image, layout, rows)
+        raise ValueError(f"Unknown page text mode: {self.cfg.page_text_mode}")
+
+    def run_around_table(
+        self, image: ImageLike, layout: tuple, rows: list[list[str]]
+    ) -> str:
+        """OCRs the page with the table area blanked out and puts the already
+        recognized table text where the table starts in reading order"""
+        # the only copy of the page, the original is still used by the caller
+        page = np.array(ImageProcessor.as_array(image))
+        x0, y0, x1, y1 = (int(round(value)) for value in layout)
+        page[max(y0, 0) : max(y1, 0), max(x0, 0) : max(x1, 0)] = 255
+
+        paragraphs = self.reader.readtext(page, paragraph=True)
+        table_text = Ocr.rows_to_text(rows)
+
+        blocks = []
+        table_placed = False
+        for box, text in paragraphs:
+            top = min(point[1] for point in box)
+            if not table_placed and top >= y0:
+                blocks.append(table_text)
+                table_placed = True
+            blocks.append(text)
+        if not table_placed:
+            blocks.append(table_text)
+
+        return "\n".join(block for block in blocks if block)
+
+    @staticmethod
+    def rows_to_text(rows: list[list[str]]) -> str:
+        return "\n".join(
+            " ".join(cell for cell in row if cell.strip() != "") for row in rows
+        ).strip()
+
     @staticmethod
     def merge_data(data):
         new_data = [data[0]]
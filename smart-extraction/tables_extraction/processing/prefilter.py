@@ -0,0 +1,109 @@
+import math
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from tables_extraction.processing.deskewer import to_grayscale
+
+
+@dataclass
+class PrefilterConfig:
+    # pages the prefilter rejects skip deskew, detection and structure
+    # recognition and come out without a table
+    enabled: bool = False
+    # longest side of the downscaled page the checks run on
+    max_size: int = 1000
+    # ruling lines tilted by up to this many degrees are still found
+    max_angle: float = 2.0
+    # a ruling line spans at least this share of the page width
+    min_line_length: float = 0.25
+    # pages with this many horizontal ruling lines may have a table
+    min_lines: int = 3
+    # blank gaps wider than this share of the page width separate columns
+    column_gap: float = 0.03
+    # text lines split into this many blocks look like table rows
+    min_columns: int = 3
+    # pages with this many such rows may have a table
+    min_rows: int = 4
+
+
+@dataclass
+class PrefilterResult:
+    ruling_lines: int
+    table_rows: int
+    might_have_table: bool
+
+
+class TablePrefilter:
+    """Cheap check of whether a page may contain a table, run before deskew.
+
+    A page passes when it has enough long horizontal ruling lines, found
+    with a morphological opening, or enough text lines that split into
+    several blocks separated by wide blank columns, as rows of a borderless
+    table do. Prose, including two column layouts, has neither."""
+
+    def __init__(self, cfg: PrefilterConfig = PrefilterConfig()):
+        self.cfg = cfg
+
+    def binarize(self, image: np.ndarray) -> np.ndarray:
+        """Downscaled page with ink as 255 and background as 0"""
+        grayscale = to_grayscale(np.asarray(image))
+        scale = self.cfg.max_size / max(grayscale.shape)
+        if scale < 1:
+            grayscale = cv2.resize(
+                grayscale, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+            )
+        _, ink = cv2.threshold(
+            grayscale, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
+        )
+        return ink
+
+    def count_ruling_lines(self, ink: np.ndarray) -> int:
+        length = max(int(ink.shape[1] * self.cfg.min_line_length), 1)
+        # a tilted line drifts this many pixels over the kernel length
+        drift = int(math.ceil(math.tan(math.radians(self.cfg.max_angle)) * length))
+        if drift > 0:
+            ink = cv2.dilate(
+                ink, cv2.getStructuringElement(cv2.MORPH_RECT, (1, drift + 1))
+            )
+        lines = cv2.morphologyEx(
+            ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (length, 1))
+        )
+        rows = lines.any(axis=1)
+        # a line several pixels thick is counted once
+        return int(rows[0]) + int(np.count_nonzero(rows[1:] & ~rows[:-1]))
+
+    def count_table_rows(self, ink: np.ndarray) -> int:
+        gap = max(int(ink.shape[1] * self.cfg.column_gap), 1)
+        # closes the gaps between letters and words, but not between columns
+        blocks = cv2.morphologyEx(
+            ink, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (gap, 1))
+        )
+        has_ink = blocks.any(axis=1)
+        starts = np.flatnonzero(has_ink[1:] & ~has_ink[:-1]) + 1
+        ends = np.flatnonzero(~has_ink[1:] & has_ink[:-1]) + 1
+        if has_ink[0]:
+            starts = np.insert(starts, 0, 0)
+        if has_ink[-1]:
+            ends = np.append(ends, len(has_ink))
+
+        table_rows = 0
+        for start, end in zip(starts, ends):
+            columns = blocks[start:end].any(axis=0)
+            segments = int(columns[0]) + np.count_nonzero(columns[1:] & ~columns[:-1])
+            table_rows += segments >= self.cfg.min_columns
+        return table_rows
+
+    def check(self, image: np.ndarray) -> PrefilterResult:
+        ink = self.binarize(image)
+        ruling_lines = self.count_ruling_lines(ink)
+        if ruling_lines >= self.cfg.min_lines:
+            return PrefilterResult(ruling_lines, 0, True)
+        table_rows = self.count_table_rows(ink)
+        return PrefilterResult(
+            ruling_lines, table_rows, table_rows >= self.cfg.min_rows
+        )
+
+    def might_have_table(self, image: np.ndarray) -> bool:
+        return not self.cfg.enabled or self.check(image).might_have_table
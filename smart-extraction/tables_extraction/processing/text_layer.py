@@ -0,0 +1,142 @@
+import subprocess
+import xml.etree.ElementTree as ElementTree
+from dataclasses import dataclass, field
+
+
+@dataclass
+class TextLayerConfig:
+    enabled: bool = True
+    # pages with fewer words are treated as scans and go through OCR
+    min_words: int = 20
+    timeout: int = 60
+    # words outside the table are left out of its cells unless their centre
+    # lies inside it or this share of their box overlaps it
+    min_overlap: float = 0.5
+
+
+@dataclass
+class PageWords:
+    """Words of a page with (x0, y0, x1, y1) boxes, in PDF points unless scaled"""
+
+    width: float
+    height: float
+    words: list[tuple[tuple[float, float, float, float], str]] = field(
+        default_factory=list
+    )
+
+    def scaled(self, size: tuple[int, int]) -> "PageWords":
+        sx, sy = size[0] / self.width, size[1] / self.height
+        return PageWords(
+            width=size[0],
+            height=size[1],
+            words=[
+                ((x0 * sx, y0 * sy, x1 * sx, y1 * sy), text)
+                for (x0, y0, x1, y1), text in self.words
+            ],
+        )
+
+    def shifted(self, dx: float, dy: float) -> "PageWords":
+        return PageWords(
+            width=self.width,
+            height=self.height,
+            words=[
+                ((x0 - dx, y0 - dy, x1 - dx, y1 - dy), text)
+                for (x0, y0, x1, y1), text in self.words
+            ],
+        )
+
+    def within(
+        self, box: tuple[float, float, float, float], min_overlap: float = 0.5
+    ) -> "PageWords":
+        """Words whose centre lies inside `box` or that overlap it by at least
+        `min_overlap` of their own area"""
+        bx0, by0, bx1, by1 = box
+        words = []
+        for (x0, y0, x1, y1), text in self.words:
+            cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+            inside = bx0 <= cx <= bx1 and by0 <= cy <= by1
+            if not inside:
+                overlap = max(0.0, min(x1, bx1) - max(x0, bx0)) * max(
+                    0.0, min(y1, by1) - max(y0, by0)
+                )
+                area = (x1 - x0) * (y1 - y0)
+                inside = area > 0 and overlap / area >= min_overlap
+            if inside:
+                words.append(((x0, y0, x1, y1), text))
+        return PageWords(width=self.width, height=self.height, words=words)
+
+    def as_ocr_results(self) -> list:
+        """Same (points, text, confidence) layout as easyocr readtext"""
+        return [
+            ([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], text, 1.0)
+            for (x0, y0, x1, y1), text in self.words
+        ]
+
+    def lines(self) -> list[str]:
+        lines = []
+        line_bottom = None
+        for (x0, y0, x1, y1), text in sorted(
+            self.words, key=lambda word: (word[0][1], word[0][0])
+        ):
+            if line_bottom is None or (y0 + y1) / 2 > line_bottom:
+                lines.append([])
+                line_bottom = y1
+            lines[-1].append((x0, text))
+            line_bottom = max(line_bottom, y1)
+
+        return [" ".join(text for _, text in sorted(line)) for line in lines]
+
+    def text(self) -> str:
+        return "\n".join(self.lines())
+
+
+class TextLayer:
+    def __init__(self, cfg: TextLayerConfig = TextLayerConfig()):
+        self.cfg = cfg
+
+    def read_pdf_path(
+        self, pdf_path: str, first_page: int, last_page: int
+    ) -> list[PageWords]:
+        """Returns the embedded words of every page in the inclusive range"""
+        output = subprocess.run(
+            [
+                "pdftotext",
+                "-bbox",
+                "-f",
+                str(first_page),
+                "-l",
+                str(last_page),
+                pdf_path,
+                "-",
+            ],
+            capture_output=True,
+            check=True,
+            timeout=self.cfg.timeout,
+        ).stdout
+
+        pages = []
+        for element in ElementTree.fromstring(output).iter():
+            if element.tag.endswith("page"):
+                pages.append(
+                    PageWords(
+                        width=float(element.get("width")),
+                        height=float(element.get("height")),
+                    )
+                )
+            elif element.tag.endswith("word") and element.text and pages:
+                pages[-1].words.append(
+                    (
+                        (
+                            float(element.get("xMin")),
+                            float(element.get("yMin")),
+                            float(element.get("xMax")),
+                            float(element.get("yMax")),
+                        ),
+                        element.text,
+                    )
+                )
+
+        return pages
+
+    def usable(self, page_words: PageWords | None) -> bool:
+        return page_words is not None and len(page_words.words) >= self.cfg.min_words
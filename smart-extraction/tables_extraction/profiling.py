@@ -0,0 +1,230 @@
+import cProfile
+import json
+import logging
+import resource
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProfilerConfig:
+    enabled: bool = True
+    # tracemalloc peaks are exact for python and numpy allocations but slow
+    # every allocation down, so they are opt-in
+    trace_memory: bool = False
+    # when set, every extract_tables call runs under cProfile and its stats
+    # are dumped to "<cprofile_dir>/<call number>.prof"
+    cprofile_dir: str | Path | None = None
+    # records kept for export, older ones are dropped
+    max_records: int = 100_000
+
+
+@dataclass
+class StageRecord:
+    stage: str
+    page: int | None
+    seconds: float
+    peak_memory_bytes: int | None = None
+    counts: dict[str, int] = field(default_factory=dict)
+    error: str | None = None
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def max_rss_bytes() -> int:
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Profiler:
+    """Records wall time, memory peaks and item counts of pipeline stages"""
+
+    def __init__(self, cfg: ProfilerConfig | None = None):
+        self.cfg = cfg or ProfilerConfig()
+        self.records: list[StageRecord] = []
+        self.calls = 0
+        self._lock = threading.Lock()
+
+        if self.cfg.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str, page: int | None = None, **counts: int):
+        """Times the block; counts may be updated through the yielded record"""
+        record = StageRecord(stage=name, page=page, seconds=0.0, counts=counts)
+        if not self.cfg.enabled:
+            yield record
+            return
+
+        start = self._start()
+        try:
+            yield record
+        except Exception as e:
+            record.error = repr(e)
+            raise
+        finally:
+            self._finish(record, start)
+
+    def _start(self) -> float:
+        if self.cfg.trace_memory:
+            tracemalloc.reset_peak()
+        return time.perf_counter()
+
+    def _finish(self, record: StageRecord, start: float):
+        record.seconds = time.perf_counter() - start
+        if self.cfg.trace_memory:
+            record.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+        self.add(record)
+
+    def iterate(self, name: str, items: Iterable, first_page: int = 0) -> Iterator:
+        """Times producing every item of a lazy iterator, e.g. page rendering;
+        the final next() that finds the iterator exhausted is not recorded"""
+        iterator = iter(items)
+        page = first_page
+        while True:
+            record = StageRecord(stage=name, page=page, seconds=0.0, counts={"pages": 1})
+            start = self._start() if self.cfg.enabled else 0.0
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            except Exception as e:
+                record.error = repr(e)
+                if self.cfg.enabled:
+                    self._finish(record, start)
+                raise
+            if self.cfg.enabled:
+                self._finish(record, start)
+            yield item
+            page += 1
+
+    def add(self, record: StageRecord):
+        with self._lock:
+            self.records.append(record)
+            if len(self.records) > self.cfg.max_records:
+                del self.records[: len(self.records) - self.cfg.max_records]
+
+    def error(self, stage: str, page: int | None, e: Exception):
+        logger.exception("%s failed on page %s", stage, page)
+        self.add(StageRecord(stage=stage, page=page, seconds=0.0, error=repr(e)))
+
+    @contextmanager
+    def call(self):
+        """Wraps one extract_tables call, optionally under cProfile"""
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+
+        if self.cfg.cprofile_dir is None:
+            yield
+            return
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            cprofile_dir = Path(self.cfg.cprofile_dir)
+            cprofile_dir.mkdir(parents=True, exist_ok=True)
+            profile.dump_stats(cprofile_dir / f"{call}.prof")
+
+    def reset(self):
+        with self._lock:
+            self.records = []
+
+    def summary(self) -> dict[str, dict]:
+        with self._lock:
+            records = list(self.records)
+
+        stages = defaultdict(list)
+        for record in records:
+            stages[record.stage].append(record)
+
+        summary = {}
+        for stage, stage_records in stages.items():
+            timed = [record.seconds for record in stage_records if record.error is None]
+            counts = defaultdict(int)
+            for record in stage_records:
+                for key, value in record.counts.items():
+                    counts[key] += value
+            peaks = [
+                record.peak_memory_bytes
+                for record in stage_records
+                if record.peak_memory_bytes is not None
+            ]
+            summary[stage] = {
+                "calls": len(timed),
+                "errors": sum(record.error is not None for record in stage_records),
+                "total_seconds": sum(timed),
+                "mean_seconds": sum(timed) / len(timed) if timed else 0.0,
+                "p50_seconds": percentile(timed, 0.5),
+                "p95_seconds": percentile(timed, 0.95),
+                "max_seconds": max(timed, default=0.0),
+                "peak_memory_bytes": max(peaks, default=None),
+                "counts": dict(counts),
+            }
+        return summary
+
+    def to_json(self, with_records: bool = False) -> str:
+        data = {
+            "calls": self.calls,
+            "max_rss_bytes": max_rss_bytes(),
+            "stages": self.summary(),
+        }
+        if with_records:
+            with self._lock:
+                data["records"] = [asdict(record) for record in self.records]
+        return json.dumps(data, ensure_ascii=False)
+
+    def to_prometheus(self, prefix: str = "tables_extraction") -> str:
+        lines = [
+            f"# TYPE {prefix}_calls_total counter",
+            f"{prefix}_calls_total {self.calls}",
+            f"# TYPE {prefix}_max_rss_bytes gauge",
+            f"{prefix}_max_rss_bytes {max_rss_bytes()}",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        summary = self.summary()
+        for stage, stats in summary.items():
+            label = f'stage="{stage}"'
+            lines += [
+                f'{prefix}_stage_seconds{{{label},quantile="0.5"}} {stats["p50_seconds"]}',
+                f'{prefix}_stage_seconds{{{label},quantile="0.95"}} {stats["p95_seconds"]}',
+                f"{prefix}_stage_seconds_sum{{{label}}} {stats['total_seconds']}",
+                f"{prefix}_stage_seconds_count{{{label}}} {stats['calls']}",
+            ]
+
+        lines.append(f"# TYPE {prefix}_stage_errors_total counter")
+        for stage, stats in summary.items():
+            lines.append(f'{prefix}_stage_errors_total{{stage="{stage}"}} {stats["errors"]}')
+
+        lines.append(f"# TYPE {prefix}_stage_items_total counter")
+        for stage, stats in summary.items():
+            for key, value in stats["counts"].items():
+                lines.append(
+                    f'{prefix}_stage_items_total{{stage="{stage}",item="{key}"}} {value}'
+                )
+
+        lines.append(f"# TYPE {prefix}_stage_peak_memory_bytes gauge")
+        for stage, stats in summary.items():
+            if stats["peak_memory_bytes"] is not None:
+                lines.append(
+                    f'{prefix}_stage_peak_memory_bytes{{stage="{stage}"}} '
+                    f'{stats["peak_memory_bytes"]}'
+                )
+
+        return "\n".join(lines) + "\n"
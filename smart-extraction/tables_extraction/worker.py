@@ -0,0 +1,66 @@
+"""Long-lived extraction process for callers in another environment.
+
+Once it has imported the extraction pipeline it writes {"ready": true}, or
+{"error": "..."} and exits if that failed. Then it reads one JSON request
+per line from stdin, {"pdf": path, "workers": n}, and answers each with one
+JSON line on stdout:
+
+    {"tables": [{"columns": [...], "data": [[...]]} or null per page],
+     "texts": [page text or null per page]}
+
+or {"error": "..."} if the document could not be extracted. The models are
+loaded once and stay warm for every following request.
+
+    python -m tables_extraction.worker
+"""
+
+import json
+import os
+import sys
+
+import pandas as pd
+
+
+def table_payload(df: pd.DataFrame | None) -> dict | None:
+    if df is None:
+        return None
+    return json.loads(df.to_json(orient="split", index=False, force_ascii=False))
+
+
+def main():
+    # libraries and native code print progress bars and warnings, send
+    # everything written to stdout to stderr and keep a private copy for replies
+    sys.stdout.flush()
+    protocol = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    # imported after the redirect, loading torch and the models prints too
+    try:
+        from tables_extraction.main import extract_tables
+    except Exception as e:
+        protocol.write(json.dumps({"error": repr(e)}) + "\n")
+        protocol.flush()
+        raise SystemExit(1)
+    protocol.write(json.dumps({"ready": True}) + "\n")
+    protocol.flush()
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            table_dfs, texts = extract_tables(
+                request["pdf"], workers=request.get("workers", 1)
+            )
+            response = {
+                "tables": [table_payload(df) for df in table_dfs],
+                "texts": texts,
+            }
+        except Exception as e:
+            response = {"error": repr(e)}
+        protocol.write(json.dumps(response, ensure_ascii=False) + "\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    main()